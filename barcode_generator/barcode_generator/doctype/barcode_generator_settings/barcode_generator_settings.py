@@ -0,0 +1,22 @@
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import cint
+
+from barcode_generator.utils.image_cache import reset_image_cache
+
+class BarcodeGeneratorSettings(Document):
+    def validate(self):
+        if cint(self.bulk_insert_chunk_size) <= 0:
+            frappe.throw(_("Bulk Insert Chunk Size must be greater than zero"))
+        if cint(self.job_chunk_size) <= 0:
+            frappe.throw(_("Job Commit Chunk Size must be greater than zero"))
+
+    def on_update(self):
+        # Rebuild this worker's image cache with the new size and Redis settings
+        reset_image_cache()
+
+
+def get_barcode_settings():
+    """Return the cached Barcode Generator Settings document"""
+    return frappe.get_cached_doc("Barcode Generator Settings")
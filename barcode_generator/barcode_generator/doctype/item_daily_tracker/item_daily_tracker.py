@@ -2,11 +2,18 @@ import frappe
 from frappe import _
 from frappe.model.document import Document
 
+from barcode_generator.barcode_generator.doctype.pos_shift_item_counter.pos_shift_item_counter import (
+    get_shift_counter_watermark,
+    get_shift_item_counts,
+)
+
 class ItemDailyTracker(Document):
     def validate(self):
-        # Optional: Clear and repopulate items on save
-        self.items = []
-        if self.pos_opening_entry:
+        # Repopulate items on save, unless the shift's counters are unchanged since the last fill
+        if not self.pos_opening_entry:
+            self.items = []
+            self.source_watermark = None
+        elif self.source_watermark != get_shift_counter_watermark(self.pos_opening_entry):
             self.fetch_reconciliation_data()
 
     def fetch_reconciliation_data(self):
@@ -14,92 +21,24 @@ class ItemDailyTracker(Document):
         Fetches data from POS Serial Validation and POS Closing Entry,
         compares counts for each item, and populates the items child table.
         """
-        # Initialize dictionaries to store item counts
-        serial_items = {}
-        invoice_items = {}
-
-        # Fetch items from POS Serial Validation
-        serial_validations = frappe.get_all(
-            "POS Serial Validation",
-            filters={
-                "pos_opening_entry": self.pos_opening_entry,
-                "docstatus": 1
-            },
-            fields=["name"]
-        )
-        
+        # Serial counts are kept per shift and item by POS Shift Item Counter, updated as
+        # validations are submitted; invoice counts come from the closing's references.
+        # The watermark is taken first: a delta landing in between only causes one more refill.
+        watermark = get_shift_counter_watermark(self.pos_opening_entry)
+        counts = get_shift_item_counts(self.pos_opening_entry)
+        self.source_watermark = watermark
 
-        for validation in serial_validations:
-            # UPDATED: Changed doctype name and added qty filter
-            # Replace "Serial Numbers Table" with your actual child table name
-            serial_details = frappe.get_all(
-                "POS Serial Validation Item",  # Change this to your actual child table name
-                filters={
-                    "parent": validation.name,
-                    "qty": ["!=", -1]  # Filter out items where qty = -1
-                },
-                fields=["item_code", "item_name", "serial_no", "qty"]  # Added qty field
-            )
-            
-            
-            for detail in serial_details:
-                item_code = detail.item_code
-                if item_code not in serial_items:
-                    serial_items[item_code] = {
-                        "item_name": detail.item_name,
-                        "serial_count": 0,
-                        "serials": []
-                    }
-                
-                if detail.serial_no not in serial_items[item_code]["serials"]:
-                    serial_items[item_code]["serials"].append(detail.serial_no)
-                    # UPDATED: Use qty field if available, otherwise count as 1
-                    qty_to_add = detail.qty if detail.qty and detail.qty > 0 else 1
-                    serial_items[item_code]["serial_count"] += qty_to_add
-        
-        # Fetch items from POS Closing Entry
-        closing_entries = frappe.get_all(
-            "POS Closing Entry",
-            filters={"pos_opening_entry": self.pos_opening_entry},
-            fields=["name"]
-        )
-        
-        
-        for closing in closing_entries:
-            invoices = frappe.get_all(
-                "POS Invoice Reference",
-                filters={"parent": closing.name},
-                fields=["pos_invoice"]
-            )
-            
-            for inv in invoices:
-                items = frappe.get_all(
-                    "POS Invoice Item",
-                    filters={"parent": inv.pos_invoice},
-                    fields=["item_code", "item_name", "qty"]
-                )
-                
-                for item in items:
-                    item_code = item.item_code
-                    if item_code not in invoice_items:
-                        invoice_items[item_code] = {
-                            "item_name": item.item_name,
-                            "invoice_count": 0
-                        }
-                    
-                    invoice_items[item_code]["invoice_count"] += item.qty
-        
         # Clear existing items
         self.items = []
         
-        # Combine data and populate the items child table
-        all_item_codes = set(list(serial_items.keys()) + list(invoice_items.keys()))
+        # Populate the items child table
+        all_item_codes = set(counts)
         
         
         for item_code in all_item_codes:
-            serial_count = serial_items.get(item_code, {}).get("serial_count", 0)
-            invoice_count = invoice_items.get(item_code, {}).get("invoice_count", 0)
-            item_name = serial_items.get(item_code, {}).get("item_name") or invoice_items.get(item_code, {}).get("item_name") or ""
+            serial_count = counts[item_code].serial_count
+            invoice_count = counts[item_code].invoice_count
+            item_name = counts[item_code].item_name or ""
             
             difference = serial_count - invoice_count
             
@@ -114,6 +53,71 @@ class ItemDailyTracker(Document):
         if not all_item_codes:
             frappe.msgprint(_("No items found for the selected POS Opening Entry."))
 
+def get_serial_counts(pos_opening_entry):
+    """
+    Full recount, used to rebuild POS Shift Item Counter rows.
+    Serial counts per item from the submitted POS Serial Validations of a shift.
+    Rows with qty = -1 are left out, and a serial scanned more than once counts once,
+    with the qty of its first occurrence (or 1 when that qty is not positive).
+    """
+    rows = frappe.db.sql(
+        """
+        SELECT
+            ranked.item_code,
+            MAX(CASE WHEN ranked.item_occurrence = 1 THEN ranked.item_name END) AS item_name,
+            SUM(CASE WHEN ranked.qty > 0 THEN ranked.qty ELSE 1 END) AS serial_count
+        FROM (
+            SELECT
+                item.item_code, item.item_name, item.qty,
+                ROW_NUMBER() OVER (
+                    PARTITION BY item.item_code, item.serial_no
+                    ORDER BY validation.modified DESC, item.modified DESC
+                ) AS serial_occurrence,
+                ROW_NUMBER() OVER (
+                    PARTITION BY item.item_code
+                    ORDER BY validation.modified DESC, item.modified DESC
+                ) AS item_occurrence
+            FROM `tabPOS Serial Validation Item` item
+            INNER JOIN `tabPOS Serial Validation` validation ON validation.name = item.parent
+            WHERE validation.pos_opening_entry = %(pos_opening_entry)s
+                AND validation.docstatus = 1
+                AND IFNULL(item.qty, 0) != -1
+        ) ranked
+        WHERE ranked.serial_occurrence = 1
+        GROUP BY ranked.item_code
+        """,
+        {"pos_opening_entry": pos_opening_entry},
+        as_dict=True
+    )
+    return {row.item_code: row for row in rows}
+
+def get_invoice_counts(pos_opening_entry):
+    """Full recount of invoiced quantities per item over the POS Invoices referenced by a shift's POS Closing Entries"""
+    rows = frappe.db.sql(
+        """
+        SELECT
+            ranked.item_code,
+            MAX(CASE WHEN ranked.item_occurrence = 1 THEN ranked.item_name END) AS item_name,
+            SUM(ranked.qty) AS invoice_count
+        FROM (
+            SELECT
+                item.item_code, item.item_name, item.qty,
+                ROW_NUMBER() OVER (
+                    PARTITION BY item.item_code
+                    ORDER BY closing.modified DESC, reference.modified DESC, item.modified DESC
+                ) AS item_occurrence
+            FROM `tabPOS Closing Entry` closing
+            INNER JOIN `tabPOS Invoice Reference` reference ON reference.parent = closing.name
+            INNER JOIN `tabPOS Invoice Item` item ON item.parent = reference.pos_invoice
+            WHERE closing.pos_opening_entry = %(pos_opening_entry)s
+        ) ranked
+        GROUP BY ranked.item_code
+        """,
+        {"pos_opening_entry": pos_opening_entry},
+        as_dict=True
+    )
+    return {row.item_code: row for row in rows}
+
 @frappe.whitelist()
 def populate_items(docname, pos_opening_entry):
     """
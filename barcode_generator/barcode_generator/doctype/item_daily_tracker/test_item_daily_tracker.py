@@ -0,0 +1,147 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, flt, now_datetime
+
+from barcode_generator.barcode_generator.doctype.item_daily_tracker.item_daily_tracker import (
+    get_invoice_counts,
+    get_serial_counts,
+)
+
+
+def insert_doc(values, modified=None):
+    """Insert a document and its child rows as-is, skipping validation and links, for fixtures"""
+    doc = frappe.get_doc(values)
+    doc.name = doc.name or frappe.generate_hash(length=12)
+    doc.creation = doc.modified = modified or now_datetime()
+    doc.db_insert()
+    for child in doc.get_all_children():
+        child.creation = child.modified = doc.modified
+        child.docstatus = doc.docstatus
+        child.db_insert()
+    return doc
+
+def make_pos_serial_validation(pos_opening_entry, rows, docstatus=1, modified=None):
+    """`rows` are (serial_no, item_code, item_name, qty) tuples"""
+    return insert_doc({
+        "doctype": "POS Serial Validation",
+        "pos_opening_entry": pos_opening_entry,
+        "docstatus": docstatus,
+        "serial_numbers": [
+            {"serial_no": serial_no, "item_code": item_code, "item_name": item_name, "qty": qty}
+            for serial_no, item_code, item_name, qty in rows
+        ]
+    }, modified)
+
+def make_pos_invoice(rows, docstatus=1, pos_opening_entry=None, modified=None):
+    """`rows` are (item_code, item_name, qty, serial_no) tuples"""
+    values = {
+        "doctype": "POS Invoice",
+        "docstatus": docstatus,
+        "items": [
+            {"item_code": item_code, "item_name": item_name, "qty": qty, "serial_no": serial_no}
+            for item_code, item_name, qty, serial_no in rows
+        ]
+    }
+    if pos_opening_entry:
+        values["pos_opening_entry"] = pos_opening_entry
+    return insert_doc(values, modified)
+
+def make_pos_closing_entry(pos_opening_entry, invoices, modified=None):
+    return insert_doc({
+        "doctype": "POS Closing Entry",
+        "pos_opening_entry": pos_opening_entry,
+        "docstatus": 1,
+        "pos_transactions": [{"pos_invoice": invoice.name} for invoice in invoices]
+    }, modified)
+
+def get_legacy_counts(pos_opening_entry):
+    """The per-document loops fetch_reconciliation_data used before the grouped queries"""
+    serial_items = {}
+    invoice_items = {}
+
+    for validation in frappe.get_all(
+        "POS Serial Validation",
+        filters={"pos_opening_entry": pos_opening_entry, "docstatus": 1},
+        fields=["name"]
+    ):
+        for detail in frappe.get_all(
+            "POS Serial Validation Item",
+            filters={"parent": validation.name, "qty": ["!=", -1]},
+            fields=["item_code", "item_name", "serial_no", "qty"]
+        ):
+            item = serial_items.setdefault(detail.item_code, {"item_name": detail.item_name, "serial_count": 0, "serials": []})
+            if detail.serial_no not in item["serials"]:
+                item["serials"].append(detail.serial_no)
+                item["serial_count"] += detail.qty if detail.qty and detail.qty > 0 else 1
+
+    for closing in frappe.get_all("POS Closing Entry", filters={"pos_opening_entry": pos_opening_entry}, fields=["name"]):
+        for reference in frappe.get_all("POS Invoice Reference", filters={"parent": closing.name}, fields=["pos_invoice"]):
+            for detail in frappe.get_all(
+                "POS Invoice Item", filters={"parent": reference.pos_invoice}, fields=["item_code", "item_name", "qty"]
+            ):
+                item = invoice_items.setdefault(detail.item_code, {"item_name": detail.item_name, "invoice_count": 0})
+                item["invoice_count"] += detail.qty
+
+    return serial_items, invoice_items
+
+
+class TestItemDailyTracker(FrappeTestCase):
+    def setUp(self):
+        self.pos_opening_entry = f"_Test POS Opening {frappe.generate_hash(length=6)}"
+        self.start = now_datetime()
+
+    def at(self, minutes):
+        return add_to_date(self.start, minutes=minutes)
+
+    def test_serial_counts_match_legacy_loop(self):
+        shift = self.pos_opening_entry
+        make_pos_serial_validation(shift, [
+            ("SN-A-1", "_Test Item A", "Item A", 2),
+            ("SN-A-2", "_Test Item A", "Item A", -1),    # returned: left out
+            ("SN-A-3", "_Test Item A", "Item A", None),  # no qty: counts as 1
+            ("SN-B-1", "_Test Item B", "Item B", 0),     # zero qty: counts as 1
+        ], modified=self.at(1))
+        make_pos_serial_validation(shift, [
+            ("SN-A-1", "_Test Item A", "Item A", 5),     # scanned again in another validation: counts once
+            ("SN-B-1", "_Test Item B", "Item B", 3),
+            ("SN-B-2", "_Test Item B", "Item B", 1),
+        ], modified=self.at(2))
+        make_pos_serial_validation(shift, [("SN-C-1", "_Test Item C", "Item C", 1)], docstatus=2, modified=self.at(3))
+        make_pos_serial_validation(f"{shift}-other", [("SN-A-9", "_Test Item A", "Item A", 1)], modified=self.at(4))
+
+        legacy, _ = get_legacy_counts(shift)
+        counts = get_serial_counts(shift)
+
+        self.assertEqual(set(counts), set(legacy))
+        self.assertNotIn("_Test Item C", counts)
+        for item_code, item in legacy.items():
+            self.assertEqual(flt(counts[item_code].serial_count), flt(item["serial_count"]), item_code)
+            self.assertEqual(counts[item_code].item_name, item["item_name"], item_code)
+
+    def test_invoice_counts_match_legacy_loop(self):
+        shift = self.pos_opening_entry
+        first = make_pos_invoice([
+            ("_Test Item A", "Item A", 2, "SN-A-1"),
+            ("_Test Item B", "Item B", 1, "SN-B-1"),
+        ], modified=self.at(1))
+        # The same serial sold again on a later invoice is counted on both
+        second = make_pos_invoice([
+            ("_Test Item A", "Item A", 1, "SN-A-1"),
+            ("_Test Item A", "Item A", 3, None),
+        ], modified=self.at(2))
+        make_pos_invoice([("_Test Item C", "Item C", 4, None)], modified=self.at(3))  # in no closing
+        make_pos_closing_entry(shift, [first], modified=self.at(4))
+        make_pos_closing_entry(shift, [second], modified=self.at(5))
+
+        _, legacy = get_legacy_counts(shift)
+        counts = get_invoice_counts(shift)
+
+        self.assertEqual(set(counts), set(legacy))
+        self.assertNotIn("_Test Item C", counts)
+        for item_code, item in legacy.items():
+            self.assertEqual(flt(counts[item_code].invoice_count), flt(item["invoice_count"]), item_code)
+            self.assertEqual(counts[item_code].item_name, item["item_name"], item_code)
+
+    def test_empty_shift(self):
+        self.assertEqual(get_serial_counts(self.pos_opening_entry), {})
+        self.assertEqual(get_invoice_counts(self.pos_opening_entry), {})
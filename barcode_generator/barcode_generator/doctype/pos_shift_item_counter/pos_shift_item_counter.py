@@ -0,0 +1,228 @@
+import hashlib
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import flt, now
+
+
+class POSShiftItemCounter(Document):
+    def autoname(self):
+        self.name = get_counter_name(self.pos_opening_entry, self.item_code)
+
+
+def get_counter_name(pos_opening_entry, item_code):
+    """Deterministic row name for a (shift, item) pair, so deltas can upsert on the primary key"""
+    return hashlib.sha1(f"{pos_opening_entry}\n{item_code}".encode()).hexdigest()[:20]
+
+def apply_serial_validation(doc, method=None):
+    """
+    doc_events hook for POS Serial Validation on_submit / on_cancel.
+    Adds (or on cancel removes) the validation's serials to its shift's counters.
+    A serial already counted through another submitted validation of the shift is skipped,
+    matching the once-per-serial rule of the full recount.
+    """
+    if not doc.pos_opening_entry or not doc.serial_numbers:
+        return
+
+    sign = -1 if method == "on_cancel" else 1
+    rows = [row for row in doc.serial_numbers if row.item_code and row.qty != -1]
+    counted_elsewhere = get_serials_counted_elsewhere(doc.pos_opening_entry, doc.name, rows)
+
+    deltas = {}
+    for row in rows:
+        if (row.item_code, row.serial_no) in counted_elsewhere:
+            continue
+        counted_elsewhere.add((row.item_code, row.serial_no))
+        delta = deltas.setdefault(row.item_code, [row.item_name, 0])
+        delta[1] += row.qty if row.qty and row.qty > 0 else 1
+
+    for item_code, (item_name, serial_count) in deltas.items():
+        add_to_counter(doc.pos_opening_entry, item_code, item_name, serial_count=sign * serial_count)
+
+def get_serials_counted_elsewhere(pos_opening_entry, validation_name, rows):
+    """(item_code, serial_no) pairs of `rows` that other submitted validations of the shift already hold"""
+    serial_nos = list({row.serial_no for row in rows if row.serial_no})
+    if not serial_nos:
+        return set()
+
+    return set(frappe.db.sql(
+        """
+        SELECT DISTINCT item.item_code, item.serial_no
+        FROM `tabPOS Serial Validation Item` item
+        INNER JOIN `tabPOS Serial Validation` validation ON validation.name = item.parent
+        WHERE validation.pos_opening_entry = %(pos_opening_entry)s
+            AND validation.docstatus = 1
+            AND validation.name != %(validation)s
+            AND IFNULL(item.qty, 0) != -1
+            AND item.serial_no IN %(serial_nos)s
+        """,
+        {"pos_opening_entry": pos_opening_entry, "validation": validation_name, "serial_nos": serial_nos}
+    ))
+
+def apply_pos_invoice(doc, method=None):
+    """
+    doc_events hook for POS Invoice on_submit / on_cancel.
+    Adds (or on cancel removes) the invoice's item quantities to the shift it is tagged with
+    (POS Invoice.pos_opening_entry), while that shift is still open. Untagged invoices are
+    left to the closing, whose references are counted when the tracker is filled.
+    """
+    pos_opening_entry = doc.get("pos_opening_entry")
+    if not pos_opening_entry or frappe.db.get_value("POS Opening Entry", pos_opening_entry, "status") != "Open":
+        return
+
+    sign = -1 if method == "on_cancel" else 1
+    deltas = {}
+    for item in doc.items:
+        delta = deltas.setdefault(item.item_code, [item.item_name, 0])
+        delta[1] += flt(item.qty)
+
+    for item_code, (item_name, invoice_count) in deltas.items():
+        add_to_counter(pos_opening_entry, item_code, item_name, invoice_count=sign * invoice_count)
+
+def add_to_counter(pos_opening_entry, item_code, item_name, serial_count=0, invoice_count=0):
+    """
+    Atomically add to a (shift, item) counter, creating the row on first use.
+    The serial side's item name wins over the invoice side's, as in the full recount.
+    """
+    timestamp = now()
+    user = frappe.session.user
+    frappe.db.sql(
+        """
+        INSERT INTO `tabPOS Shift Item Counter`
+            (name, pos_opening_entry, item_code, item_name, serial_count, invoice_count,
+             owner, modified_by, creation, modified, docstatus)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 0)
+        ON DUPLICATE KEY UPDATE
+            item_name = IF(%s, COALESCE(VALUES(item_name), item_name), COALESCE(item_name, VALUES(item_name))),
+            serial_count = serial_count + VALUES(serial_count),
+            invoice_count = invoice_count + VALUES(invoice_count),
+            modified = VALUES(modified),
+            modified_by = VALUES(modified_by)
+        """,
+        (get_counter_name(pos_opening_entry, item_code), pos_opening_entry, item_code, item_name,
+         flt(serial_count), flt(invoice_count), user, user, timestamp, timestamp, 1 if serial_count else 0)
+    )
+
+def get_shift_item_counts(pos_opening_entry):
+    """
+    Return {item_code: {item_name, serial_count, invoice_count}} for a shift.
+    Serial counts are one read of the counters; shifts with no counters yet (e.g. opened
+    before counters existed) are rebuilt first. Once the shift has a POS Closing Entry the
+    invoice side is exactly what its references hold, from one grouped query; until then
+    it is the running count of invoices tagged with the shift.
+    """
+    from barcode_generator.barcode_generator.doctype.item_daily_tracker.item_daily_tracker import (
+        get_invoice_counts,
+    )
+
+    rows = _read_counters(pos_opening_entry)
+    if not rows:
+        rebuild_shift_item_counters(pos_opening_entry)
+        rows = _read_counters(pos_opening_entry)
+    counts = {row.item_code: row for row in rows}
+
+    if not frappe.db.exists("POS Closing Entry", {"pos_opening_entry": pos_opening_entry}):
+        return counts
+
+    invoice_items = get_invoice_counts(pos_opening_entry)
+    for item_code, row in list(counts.items()):
+        row.invoice_count = 0
+        if not row.serial_count:
+            del counts[item_code]
+    for item_code, invoice_item in invoice_items.items():
+        row = counts.setdefault(item_code, frappe._dict(item_code=item_code, item_name=None, serial_count=0))
+        row.item_name = row.item_name or invoice_item.item_name
+        row.invoice_count = invoice_item.invoice_count
+    return counts
+
+def get_shift_counter_watermark(pos_opening_entry):
+    """
+    A value that changes whenever any source of the shift's counts does: the row count and
+    latest modified timestamp of its counters, which every delta and rebuild moves forward,
+    and of its POS Closing Entries, whose references make up the invoice side once closed
+    """
+    count, last_modified, closings, last_closing = frappe.db.sql(
+        """
+        SELECT
+            (SELECT COUNT(*) FROM `tabPOS Shift Item Counter` WHERE pos_opening_entry = %(shift)s),
+            (SELECT MAX(modified) FROM `tabPOS Shift Item Counter` WHERE pos_opening_entry = %(shift)s),
+            (SELECT COUNT(*) FROM `tabPOS Closing Entry` WHERE pos_opening_entry = %(shift)s),
+            (SELECT MAX(modified) FROM `tabPOS Closing Entry` WHERE pos_opening_entry = %(shift)s)
+        """,
+        {"shift": pos_opening_entry}
+    )[0]
+    return f"{pos_opening_entry}|{count}|{last_modified or ''}|{closings}|{last_closing or ''}"
+
+def _read_counters(pos_opening_entry):
+    return frappe.db.sql(
+        """
+        SELECT item_code, item_name, serial_count, invoice_count
+        FROM `tabPOS Shift Item Counter`
+        WHERE pos_opening_entry = %s AND (serial_count != 0 OR invoice_count != 0)
+        """,
+        pos_opening_entry,
+        as_dict=True
+    )
+
+def rebuild_shift_item_counters(pos_opening_entry):
+    """
+    Recount a shift's counters from scratch, replacing what is there: serials from its
+    submitted validations, invoices from the submitted POS Invoices tagged with it
+    """
+    from barcode_generator.barcode_generator.doctype.item_daily_tracker.item_daily_tracker import (
+        get_serial_counts,
+    )
+
+    serial_items = get_serial_counts(pos_opening_entry)
+    invoice_items = get_tagged_invoice_counts(pos_opening_entry)
+
+    frappe.db.delete("POS Shift Item Counter", {"pos_opening_entry": pos_opening_entry})
+    for item_code in set(serial_items) | set(invoice_items):
+        serial_item = serial_items.get(item_code, {})
+        invoice_item = invoice_items.get(item_code, {})
+        add_to_counter(
+            pos_opening_entry, item_code,
+            serial_item.get("item_name") or invoice_item.get("item_name"),
+            serial_count=serial_item.get("serial_count", 0),
+            invoice_count=invoice_item.get("invoice_count", 0)
+        )
+
+def get_tagged_invoice_counts(pos_opening_entry):
+    """Invoiced quantities per item over the submitted POS Invoices whose pos_opening_entry is the shift"""
+    if not frappe.db.has_column("POS Invoice", "pos_opening_entry"):
+        return {}
+
+    rows = frappe.db.sql(
+        """
+        SELECT item.item_code, MAX(item.item_name) AS item_name, SUM(item.qty) AS invoice_count
+        FROM `tabPOS Invoice` invoice
+        INNER JOIN `tabPOS Invoice Item` item ON item.parent = invoice.name
+        WHERE invoice.docstatus = 1
+            AND invoice.pos_opening_entry = %s
+        GROUP BY item.item_code
+        """,
+        pos_opening_entry,
+        as_dict=True
+    )
+    return {row.item_code: row for row in rows}
+
+@frappe.whitelist()
+def rebuild_counters(pos_opening_entry=None):
+    """
+    Rebuild the item counters of one shift, or of every open shift.
+    Counters are otherwise kept up to date by deltas and only need this after data repairs.
+    """
+    frappe.only_for("System Manager")
+
+    rebuilt = rebuild_open_shift_item_counters([pos_opening_entry] if pos_opening_entry else None)
+    frappe.db.commit()
+    frappe.msgprint(_("Rebuilt item counters for {0} shift(s)").format(rebuilt))
+    return rebuilt
+
+def rebuild_open_shift_item_counters(shifts=None):
+    if shifts is None:
+        shifts = frappe.get_all("POS Opening Entry", filters={"status": "Open", "docstatus": 1}, pluck="name")
+    for pos_opening_entry in shifts:
+        rebuild_shift_item_counters(pos_opening_entry)
+    return len(shifts)
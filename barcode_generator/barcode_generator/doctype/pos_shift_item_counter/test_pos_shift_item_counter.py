@@ -0,0 +1,102 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import flt
+
+from barcode_generator.barcode_generator.doctype.item_daily_tracker.test_item_daily_tracker import (
+    insert_doc,
+    make_pos_closing_entry,
+    make_pos_invoice,
+    make_pos_serial_validation,
+)
+from barcode_generator.barcode_generator.doctype.pos_shift_item_counter.pos_shift_item_counter import (
+    apply_pos_invoice,
+    apply_serial_validation,
+    get_shift_item_counts,
+    rebuild_shift_item_counters,
+)
+
+
+class TestPOSShiftItemCounter(FrappeTestCase):
+    def setUp(self):
+        self.shift = insert_doc({
+            "doctype": "POS Opening Entry",
+            "name": f"_Test POS Opening {frappe.generate_hash(length=6)}",
+            "status": "Open",
+            "docstatus": 1
+        }).name
+        self.tags_invoices = frappe.db.has_column("POS Invoice", "pos_opening_entry")
+
+    def submit_validation(self, rows):
+        validation = make_pos_serial_validation(self.shift, rows)
+        apply_serial_validation(validation, "on_submit")
+        return validation
+
+    def cancel(self, doc, hook):
+        frappe.db.set_value(doc.doctype, doc.name, "docstatus", 2)
+        doc.docstatus = 2
+        hook(doc, "on_cancel")
+
+    def submit_invoice(self, rows):
+        invoice = make_pos_invoice(rows, pos_opening_entry=self.shift)
+        apply_pos_invoice(invoice, "on_submit")
+        return invoice
+
+    def assertCountsMatchRebuild(self):
+        """The counts kept by deltas must equal a full recount of the shift"""
+        counts = self.get_counts()
+        rebuild_shift_item_counters(self.shift)
+        self.assertEqual(counts, self.get_counts())
+        return counts
+
+    def get_counts(self):
+        return {
+            item_code: (flt(row.serial_count), flt(row.invoice_count))
+            for item_code, row in get_shift_item_counts(self.shift).items()
+        }
+
+    def test_deltas_match_rebuild_through_submit_cancel_and_resubmit(self):
+        rows = [
+            ("SN-A-1", "_Test Item A", "Item A", 1),
+            ("SN-A-2", "_Test Item A", "Item A", -1),
+            ("SN-B-1", "_Test Item B", "Item B", 2),
+        ]
+        first = self.submit_validation(rows)
+        self.assertEqual(self.assertCountsMatchRebuild(), {"_Test Item A": (1, 0), "_Test Item B": (2, 0)})
+
+        # SN-A-1 is already counted through the first validation
+        second = self.submit_validation([("SN-A-1", "_Test Item A", "Item A", 1), ("SN-A-3", "_Test Item A", "Item A", 1)])
+        self.assertEqual(self.assertCountsMatchRebuild()["_Test Item A"], (2, 0))
+
+        # SN-A-1 stays counted through the second validation
+        self.cancel(first, apply_serial_validation)
+        self.assertEqual(self.assertCountsMatchRebuild(), {"_Test Item A": (2, 0)})
+
+        # Amending the cancelled validation submits the same serials again
+        self.submit_validation(rows)
+        self.assertEqual(self.assertCountsMatchRebuild(), {"_Test Item A": (2, 0), "_Test Item B": (2, 0)})
+
+        self.cancel(second, apply_serial_validation)
+        self.assertEqual(self.assertCountsMatchRebuild(), {"_Test Item A": (1, 0), "_Test Item B": (2, 0)})
+
+        if self.tags_invoices:
+            invoice = self.submit_invoice([("_Test Item A", "Item A", 1, "SN-A-1")])
+            self.assertEqual(self.assertCountsMatchRebuild()["_Test Item A"], (1, 1))
+            self.cancel(invoice, apply_pos_invoice)
+            self.assertEqual(self.assertCountsMatchRebuild()["_Test Item A"], (1, 0))
+
+    def test_cancel_after_closing(self):
+        validation = self.submit_validation([
+            ("SN-A-1", "_Test Item A", "Item A", 1),
+            ("SN-B-1", "_Test Item B", "Item B", 1),
+        ])
+        invoice = (self.submit_invoice if self.tags_invoices else make_pos_invoice)(
+            [("_Test Item A", "Item A", 1, "SN-A-1")]
+        )
+        make_pos_closing_entry(self.shift, [invoice])
+        frappe.db.set_value("POS Opening Entry", self.shift, "status", "Closed")
+
+        # Once closed, the invoice side is what the closing references
+        self.assertEqual(self.assertCountsMatchRebuild(), {"_Test Item A": (1, 1), "_Test Item B": (1, 0)})
+
+        self.cancel(validation, apply_serial_validation)
+        self.assertEqual(self.assertCountsMatchRebuild(), {"_Test Item A": (0, 1)})
@@ -0,0 +1,112 @@
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import cint, now
+
+
+class TenacitySerialCounter(Document):
+    pass
+
+
+def get_last_serial_number(item_code):
+    """Return the highest numeric suffix used by existing Tenacity-{item_code}-#### serials"""
+    result = frappe.db.sql(
+        """
+        SELECT MAX(CAST(SUBSTRING_INDEX(serial_no, '-', -1) AS UNSIGNED))
+        FROM `tabTenacity Serial No`
+        WHERE item_code = %s
+        """,
+        item_code
+    )
+    return cint(result[0][0]) if result else 0
+
+def reserve_serial_numbers(item_code, count):
+    """
+    Reserve a block of `count` consecutive serial numbers for an item.
+    The counter row is locked for the rest of the transaction, so concurrent
+    minting for the same item waits instead of handing out the same numbers.
+    Returns the first number of the reserved block.
+    """
+    count = cint(count)
+    if count <= 0:
+        return None
+
+    last_value = _lock_counter(item_code)
+    frappe.db.sql(
+        """
+        UPDATE `tabTenacity Serial Counter`
+        SET last_value = %s, modified = %s, modified_by = %s
+        WHERE name = %s
+        """,
+        (last_value + count, now(), frappe.session.user, item_code)
+    )
+    return last_value + 1
+
+def _lock_counter(item_code):
+    """
+    Lock the counter row for an item, seeding it from existing serials if it does not exist yet.
+    The row is always created before it is locked: a SELECT ... FOR UPDATE on a missing row
+    takes a gap lock, and two first mints holding gap locks deadlock on their inserts.
+    """
+    # Plain read, no lock: only decides whether the seed query has to run
+    if not frappe.db.sql("SELECT 1 FROM `tabTenacity Serial Counter` WHERE name = %s", item_code):
+        # First mint for this item: seed from the serials already in the system.
+        # INSERT IGNORE lets a concurrent seeder win without raising.
+        timestamp = now()
+        frappe.db.sql(
+            """
+            INSERT IGNORE INTO `tabTenacity Serial Counter`
+                (name, item_code, last_value, owner, modified_by, creation, modified, docstatus)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, 0)
+            """,
+            (item_code, item_code, get_last_serial_number(item_code),
+             frappe.session.user, frappe.session.user, timestamp, timestamp)
+        )
+
+    row = frappe.db.sql(
+        "SELECT last_value FROM `tabTenacity Serial Counter` WHERE name = %s FOR UPDATE",
+        item_code
+    )
+    return cint(row[0][0])
+
+@frappe.whitelist()
+def backfill_serial_counters():
+    """
+    Seed Tenacity Serial Counter rows from the existing Tenacity Serial No records.
+    Counters never move backwards, so this is safe to re-run at any time.
+    """
+    frappe.only_for("System Manager")
+
+    seeded = seed_serial_counters()
+    frappe.db.commit()
+    frappe.msgprint(_("Seeded serial counters for {0} item(s)").format(seeded))
+    return seeded
+
+def seed_serial_counters():
+    """Upsert one counter per item from the highest existing serial suffix"""
+    timestamp = now()
+    user = frappe.session.user
+    rows = frappe.db.sql(
+        """
+        SELECT item_code, MAX(CAST(SUBSTRING_INDEX(serial_no, '-', -1) AS UNSIGNED))
+        FROM `tabTenacity Serial No`
+        WHERE IFNULL(item_code, '') != ''
+        GROUP BY item_code
+        """
+    )
+
+    for item_code, last_value in rows:
+        frappe.db.sql(
+            """
+            INSERT INTO `tabTenacity Serial Counter`
+                (name, item_code, last_value, owner, modified_by, creation, modified, docstatus)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, 0)
+            ON DUPLICATE KEY UPDATE
+                last_value = GREATEST(last_value, VALUES(last_value)),
+                modified = VALUES(modified),
+                modified_by = VALUES(modified_by)
+            """,
+            (item_code, item_code, cint(last_value), user, user, timestamp, timestamp)
+        )
+
+    return len(rows)
@@ -0,0 +1,38 @@
+import frappe
+from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
+
+from barcode_generator.utils.symbologies import SYMBOLOGIES
+
+
+def execute():
+    """
+    Add the custom_barcode_symbology fields that resolve_symbology reads, on Item for
+    a per-item symbology and on Tenacity Serial No for a per-serial override
+    """
+    options = "\n" + "\n".join(SYMBOLOGIES)
+    custom_fields = {
+        "Item": [
+            {
+                "fieldname": "custom_barcode_symbology",
+                "fieldtype": "Select",
+                "label": "Barcode Symbology",
+                "options": options,
+                "insert_after": "barcodes",
+                "description": "Symbology of this item's serial labels. Empty uses the default from Barcode Generator Settings.",
+            }
+        ],
+        "Tenacity Serial No": [
+            {
+                "fieldname": "custom_barcode_symbology",
+                "fieldtype": "Select",
+                "label": "Barcode Symbology",
+                "options": options,
+                "insert_after": "item_code",
+                "description": "Overrides the item's barcode symbology for this serial.",
+            }
+        ],
+    }
+    create_custom_fields(
+        {doctype: fields for doctype, fields in custom_fields.items() if frappe.db.exists("DocType", doctype)},
+        update=True
+    )
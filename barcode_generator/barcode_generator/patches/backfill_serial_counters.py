@@ -0,0 +1,8 @@
+from barcode_generator.barcode_generator.doctype.tenacity_serial_counter.tenacity_serial_counter import (
+    seed_serial_counters,
+)
+
+
+def execute():
+    """Seed per-item serial counters so bulk minting continues from the existing serials"""
+    seed_serial_counters()
@@ -0,0 +1,8 @@
+from barcode_generator.barcode_generator.doctype.pos_shift_item_counter.pos_shift_item_counter import (
+    rebuild_open_shift_item_counters,
+)
+
+
+def execute():
+    """Seed item counters for shifts already open, so deltas from now on land on complete counts"""
+    rebuild_open_shift_item_counters()
@@ -39,6 +39,17 @@ doctype_js = {
 # doctype_tree_js = {"doctype" : "public/js/doctype_tree.js"}
 # doctype_calendar_js = {"doctype" : "public/js/doctype_calendar.js"}
 
+# Redirects
+# ---------
+# Flat barcode URLs from before the sharded layout fall through nginx once the file has moved
+
+website_redirects = [
+	{
+		"source": r"/files/barcodes/([^/]+\.png)",
+		"target": r"/api/method/barcode_generator.utils.api.resolve_barcode_file?file_name=\1",
+	},
+]
+
 # Home Pages
 # ----------
 
@@ -101,7 +112,15 @@ doc_events = {
 doc_events = {
     "POS Closing Entry": {
        "before_submit": "barcode_generator.barcode_generator.doctype.item_daily_tracker.item_daily_tracker.handle_pos_closing_with_validation"
-   }
+   },
+    "POS Serial Validation": {
+        "on_submit": "barcode_generator.barcode_generator.doctype.pos_shift_item_counter.pos_shift_item_counter.apply_serial_validation",
+        "on_cancel": "barcode_generator.barcode_generator.doctype.pos_shift_item_counter.pos_shift_item_counter.apply_serial_validation"
+    },
+    "POS Invoice": {
+        "on_submit": "barcode_generator.barcode_generator.doctype.pos_shift_item_counter.pos_shift_item_counter.apply_pos_invoice",
+        "on_cancel": "barcode_generator.barcode_generator.doctype.pos_shift_item_counter.pos_shift_item_counter.apply_pos_invoice"
+    }
 }
 
 # Scheduled Tasks
@@ -29,5 +29,11 @@ frappe.ui.form.on('Tenacity Serial No', {
                 }
             });
         }, __('Actions'));
+
+        // Streams the label PDF straight to the browser: nothing is saved on the server
+        frm.add_custom_button(__('Download Barcode'), function() {
+            window.open('/api/method/barcode_generator.utils.api.download_barcode_for_serial_no?'
+                + $.param({'serial_no': frm.doc.name}), '_blank');
+        }, __('Actions'));
     }
 });
@@ -1,4 +1,15 @@
 frappe.ui.form.on('Purchase Receipt', {
+    onload: function(frm) {
+        // Follow progress of barcode jobs queued from this form
+        frappe.realtime.off('barcode_job_progress');
+        frappe.realtime.on('barcode_job_progress', function(data) {
+            if (!data || data.stock_entry_name !== frm.doc.name) {
+                return;
+            }
+            show_barcode_job_progress(data);
+        });
+    },
+
     refresh: function(frm) {
         // Only add button if document is submitted
         if (frm.doc.docstatus === 1) {
@@ -7,16 +18,26 @@ frappe.ui.form.on('Purchase Receipt', {
                     message: __('Generating barcodes, please wait...'),
                     indicator: 'blue'
                 });
-                
+
                 frappe.call({
-                    method: 'barcode_generator.utils.api.print_barcodes_for_stock_entry',
+                    method: 'barcode_generator.utils.api.queue_barcodes_for_stock_entry',
                     args: {
                         'stock_entry_name': frm.doc.name
                     },
                     callback: function(r) {
-                        if (r.message) {
+                        if (r.message && r.message.job_id) {
+                            frappe.show_alert({
+                                message: __('Large receipt: barcodes are being generated in the background.'),
+                                indicator: 'blue'
+                            });
+                        } else if (r.message && r.message.printer) {
+                            frappe.show_alert({
+                                message: __('{0} labels sent to printer {1}.', [r.message.labels, r.message.printer]),
+                                indicator: 'green'
+                            });
+                        } else if (r.message && r.message.file_url) {
                             // Open the PDF link in a new tab
-                            window.open(r.message, '_blank');
+                            window.open(r.message.file_url, '_blank');
                             frappe.show_alert({
                                 message: __('Barcode PDF generated and ready for download/print.'),
                                 indicator: 'green'
@@ -30,6 +51,48 @@ frappe.ui.form.on('Purchase Receipt', {
                     }
                 });
             }, __('Actions'));
+
+            // Streams the label PDF straight to the browser: nothing is saved on the server
+            frm.add_custom_button(__('Download Item Barcodes'), function() {
+                // POST, since the serials are minted on first download
+                open_url_post('/api/method/barcode_generator.utils.api.download_barcodes_for_stock_entry',
+                    {'stock_entry_name': frm.doc.name}, true);
+            }, __('Actions'));
         }
     }
 });
+
+function show_barcode_job_progress(data) {
+    const stages = {
+        'serials': __('Minting serial numbers'),
+        'images': __('Rendering barcode images'),
+        'pages': __('Writing label pages')
+    };
+    const title = __('Barcode Generation');
+
+    if (data.stage === 'done') {
+        frappe.hide_progress();
+        if (data.result && data.result.printer) {
+            frappe.show_alert({
+                message: __('{0} labels sent to printer {1}.', [data.result.labels, data.result.printer]),
+                indicator: 'green'
+            });
+            return;
+        }
+        if (typeof data.result === 'string') {
+            window.open(data.result, '_blank');
+        }
+        frappe.show_alert({
+            message: __('Barcode PDF generated and ready for download/print.'),
+            indicator: 'green'
+        });
+    } else if (data.stage === 'failed') {
+        frappe.hide_progress();
+        frappe.show_alert({
+            message: data.error || __('Could not generate barcode PDF. Check error log.'),
+            indicator: 'red'
+        });
+    } else if (stages[data.stage]) {
+        frappe.show_progress(title, data.done, data.total, stages[data.stage]);
+    }
+}
@@ -1,23 +1,115 @@
 import frappe
+from frappe.utils import cint
+from werkzeug.wrappers import Response
 from . import barcode_generator
+from .barcode_storage import BARCODE_URL_PREFIX, is_barcode_file_name, resolve_barcode_url
+from .image_cache import get_image_cache
+from .symbologies import SYMBOLOGIES
 
-@frappe.whitelist()
+# A receipt's lock expires on its own if the worker holding it dies
+SINGLE_FLIGHT_LOCK_TTL = 3600
+# How long a request waits for someone else's generation before giving up
+SINGLE_FLIGHT_WAIT = 110
+# How long a finished result is kept for callers that were waiting on it
+SINGLE_FLIGHT_RESULT_TTL = 120
+
+def single_flight(stock_entry_name, operation, fn, wait=SINGLE_FLIGHT_WAIT):
+    """
+    Run `fn()` for a Purchase Receipt (or a batch print's key) at most once at a time across all workers.
+    The first caller takes a Redis lock for the receipt, runs `fn`, commits and publishes
+    the result before releasing the lock. Concurrent callers wait for the lock and return
+    that published result instead of minting and rendering a second time. If there is no
+    result for their operation (the first run failed, or was a different operation),
+    they run `fn` themselves, still under the lock.
+    """
+    cache = frappe.cache()
+    result_key = f"barcode_single_flight:{operation}:{stock_entry_name}"
+    lock = cache.lock(
+        cache.make_key(f"barcode_single_flight_lock:{stock_entry_name}"),
+        timeout=SINGLE_FLIGHT_LOCK_TTL
+    )
+
+    if not lock.acquire(blocking=False):
+        # Someone else is generating this receipt: wait for them to finish
+        if not lock.acquire(blocking=True, blocking_timeout=wait):
+            frappe.throw(f"Barcodes for {stock_entry_name} are still being generated. Please try again shortly.")
+
+        result = cache.get_value(result_key)
+        if result is not None:
+            lock.release()
+            return result
+
+    try:
+        cache.delete_value(result_key)
+        result = fn()
+        # Waiting callers must see the committed serials and files, not just the result
+        frappe.db.commit()
+        if result:
+            cache.set_value(result_key, result, expires_in_sec=SINGLE_FLIGHT_RESULT_TTL)
+        return result
+    finally:
+        lock.release()
+
+@frappe.whitelist(methods=["POST"])
 def generate_barcodes_for_stock_entry(stock_entry_name):
     """API endpoint to generate barcodes for stock entry"""
     if not frappe.has_permission("Purchase Receipt", "write"):
         frappe.throw("Insufficient permissions to generate barcodes")
         
-    return barcode_generator.generate_barcodes_for_stock_entry(stock_entry_name)
+    return single_flight(
+        stock_entry_name, "generate",
+        lambda: barcode_generator.generate_barcodes_for_stock_entry(stock_entry_name)
+    )
 
-@frappe.whitelist()
+@frappe.whitelist(methods=["POST"])
 def print_barcodes_for_stock_entry(stock_entry_name):
     """API endpoint to print barcodes for stock entry"""
     if not frappe.has_permission("Purchase Receipt", "read"):
         frappe.throw("Insufficient permissions to print barcodes")
         
-    return barcode_generator.print_barcodes_for_stock_entry(stock_entry_name)
+    return single_flight(
+        stock_entry_name, "print",
+        lambda: barcode_generator.print_barcodes_for_stock_entry(stock_entry_name)
+    )
+
+@frappe.whitelist(methods=["POST"])
+def queue_barcodes_for_stock_entry(stock_entry_name):
+    """
+    API endpoint to print barcodes for stock entry, on a background worker for large receipts.
+    Returns {"file_url": ...} when the PDF was built within the request, {"printer": ...}
+    when the labels were sent to a thermal printer, or {"job_id": ...} when the work was queued.
+    """
+    if not frappe.has_permission("Purchase Receipt", "read"):
+        frappe.throw("Insufficient permissions to print barcodes")
+
+    settings = barcode_generator.get_barcode_settings()
+    total_qty = sum(
+        int(item.qty)
+        for item in frappe.get_all(
+            "Purchase Receipt Item",
+            filters={"parent": stock_entry_name, "parenttype": "Purchase Receipt"},
+            fields=["qty"]
+        )
+    )
+
+    if total_qty <= cint(settings.background_job_threshold):
+        result = single_flight(
+            stock_entry_name, "print",
+            lambda: barcode_generator.print_barcodes_for_stock_entry(stock_entry_name)
+        )
+        return result if isinstance(result, dict) else {"file_url": result}
+
+    return {"job_id": barcode_generator.enqueue_barcode_job(stock_entry_name)}
 
 @frappe.whitelist()
+def get_barcode_job_progress(stock_entry_name):
+    """API endpoint to poll the progress of a queued barcode job"""
+    if not frappe.has_permission("Purchase Receipt", "read"):
+        frappe.throw("Insufficient permissions to read barcode job progress")
+
+    return barcode_generator.get_barcode_job_progress(stock_entry_name)
+
+@frappe.whitelist(methods=["POST"])
 def print_barcode_for_serial_no(serial_no):
     """API endpoint to print barcode for a single serial number"""
     if not frappe.has_permission("Tenacity Serial No", "read"):
@@ -25,6 +117,138 @@ def print_barcode_for_serial_no(serial_no):
         
     return barcode_generator.print_barcode_for_serial_no(serial_no)
 
+@frappe.whitelist(methods=["POST"])
+def print_barcodes_for_serials(serial_nos=None, item_code=None, from_date=None, to_date=None,
+                               status=None, purchase_document_no=None):
+    """
+    API endpoint to print labels for many serials, from any number of receipts, into one PDF.
+    Pass `serial_nos` (a list or JSON list) or filters: item_code, from_date/to_date on creation,
+    status and purchase_document_no. Returns {"file_url": ...}, or {"job_id": ..., "batch": ...}
+    when the batch is above the background job threshold; progress is then published under the batch key.
+    """
+    if not frappe.has_permission("Tenacity Serial No", "read"):
+        frappe.throw("Insufficient permissions to print barcodes")
+
+    if isinstance(serial_nos, str):
+        serial_nos = frappe.parse_json(serial_nos)
+
+    serials = barcode_generator.get_serials_for_batch_print(
+        serial_nos=serial_nos,
+        item_code=item_code,
+        from_date=from_date,
+        to_date=to_date,
+        status=status,
+        purchase_document_no=purchase_document_no
+    )
+    if not serials:
+        frappe.throw("No serial numbers match")
+
+    batch_key = barcode_generator.get_batch_print_key(serials)
+    if len(serials) > cint(barcode_generator.get_barcode_settings().background_job_threshold):
+        job_id = barcode_generator.enqueue_barcode_job(batch_key, serial_nos=[serial.name for serial in serials])
+        return {"job_id": job_id, "batch": batch_key}
+
+    file_url = single_flight(batch_key, "print", lambda: barcode_generator.print_barcodes_for_serials(serials))
+    return {"file_url": file_url}
+
+@frappe.whitelist(methods=["POST"])
+def download_barcodes_for_stock_entry(stock_entry_name):
+    """
+    API endpoint streaming the stock entry's label PDF straight into the response,
+    page by page, without saving a file or creating a File document.
+    POST only, like every endpoint that can mint serials.
+    """
+    if not frappe.has_permission("Purchase Receipt", "read"):
+        frappe.throw("Insufficient permissions to print barcodes")
+
+    # Only the serials have to exist; images missing from storage are rendered while streaming
+    barcodes = single_flight(
+        stock_entry_name, "mint",
+        lambda: barcode_generator.generate_barcodes_for_stock_entry(stock_entry_name, render_images=False)
+    )
+    if not barcodes:
+        frappe.throw(f"No serial numbers found for {stock_entry_name}")
+
+    return pdf_download_response(
+        barcode_generator.stream_barcodes_for_stock_entry(stock_entry_name, barcodes),
+        f"{stock_entry_name}_barcodes.pdf"
+    )
+
+@frappe.whitelist(methods=["GET"])
+def download_barcode_for_serial_no(serial_no):
+    """API endpoint streaming a single serial's label PDF straight into the response"""
+    if not frappe.has_permission("Tenacity Serial No", "read"):
+        frappe.throw("Insufficient permissions to print barcode")
+
+    return pdf_download_response(
+        barcode_generator.stream_barcode_for_serial_no(serial_no),
+        f"{serial_no}_barcode.pdf"
+    )
+
+def pdf_download_response(chunks, file_name):
+    return Response(
+        chunks,
+        mimetype="application/pdf",
+        headers={"Content-Disposition": f'inline; filename="{file_name}"', "Cache-Control": "no-store"},
+        direct_passthrough=True
+    )
+
+@frappe.whitelist()
+def get_barcode_cache_stats():
+    """API endpoint returning hit/miss/eviction counters of this worker's barcode image cache"""
+    frappe.only_for("System Manager")
+
+    return get_image_cache().get_stats()
+
+@frappe.whitelist(allow_guest=True, methods=["GET"])
+def resolve_barcode_file(file_name):
+    """
+    Redirect a flat /files/barcodes/<file_name> URL to wherever the image lives now.
+    Reached through website_redirects when the flat file no longer exists on disk.
+    Open to guests, so anything but a bare barcode PNG name is a 404.
+    """
+    if not is_barcode_file_name(file_name):
+        raise frappe.DoesNotExistError
+
+    file_url = resolve_barcode_url(f"{BARCODE_URL_PREFIX}{file_name}")
+    if not file_url:
+        raise frappe.DoesNotExistError
+
+    frappe.local.response["type"] = "redirect"
+    frappe.local.response["location"] = file_url
+
+@frappe.whitelist(methods=["GET"])
+def barcode_image(serial_no, symbology=None):
+    """
+    API endpoint rendering a serial's barcode as PNG on request, through the image cache.
+    The ETag is the image's content key, so browsers and proxies revalidate with a
+    304 that needs no rendering at all.
+    """
+    if not frappe.has_permission("Tenacity Serial No", "read"):
+        frappe.throw("Insufficient permissions to view barcode")
+
+    if symbology and symbology not in SYMBOLOGIES:
+        frappe.throw(f"Unknown barcode symbology: {symbology}", frappe.DoesNotExistError)
+
+    item_code = frappe.db.get_value("Tenacity Serial No", serial_no, "item_code")
+    if item_code is None:
+        raise frappe.DoesNotExistError
+
+    generator = barcode_generator.BarcodeGenerator()
+    symbology = generator.resolve_symbology(item_code, symbology, serial_no)
+    cache_key = get_image_cache().make_key(serial_no, symbology, generator.get_cache_params(symbology))
+    etag = f'"{cache_key}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=86400"}
+
+    if etag in (frappe.request.headers.get("If-None-Match") or ""):
+        return Response(status=304, headers=headers)
+
+    png = generator.load_barcode_png(serial_no, symbology)
+    if not png:
+        frappe.throw("Could not render barcode")
+
+    return Response(png, mimetype="image/png", headers=headers)
+
 def stock_entry_after_submit(doc, method):
     """Hook for Stock Entry after submission"""
     # We don't want to auto-generate barcodes here, just let the user click the button
@@ -1,16 +1,61 @@
 import frappe
+import hashlib
+import json
 import os
-import barcode
-##from barcode.writer import ImageWriter
+from frappe.utils import cint, now
 from io import BytesIO
+from urllib.parse import urlencode
 from PIL import Image
 import base64
-from fpdf import FPDF
-import qrcode
+
+from barcode_generator.utils.barcode_storage import (
+    ARCHIVE_URL_PREFIX,
+    BARCODE_URL_PREFIX,
+    BarcodeArchive,
+    get_archive_member_url,
+    get_archive_url,
+    get_barcode_file_path,
+    get_barcode_file_url,
+    resolve_barcode_path,
+    split_archive_member_url,
+    write_barcode_file,
+)
+from barcode_generator.utils.image_cache import get_image_cache
+from barcode_generator.utils.label_pdf import StreamingLabelPDF
+from barcode_generator.utils.label_templates import (
+    LABEL_TEMPLATES,
+    LabelSheet,
+    compile_label_template,
+    draw_label,
+    get_label_sheet,
+    iter_label_slots,
+)
+from barcode_generator.utils.pdf_vector import QR_DRAWERS
+from barcode_generator.utils.thermal import THERMAL_LANGUAGES, ThermalLabelRenderer, send_to_printer
+from barcode_generator.utils.render_pool import render_pngs
+from barcode_generator.utils.symbologies import DEFAULT_SYMBOLOGY, SYMBOLOGIES, get_symbology, set_qr_mask_pattern
+from barcode_generator.barcode_generator.doctype.barcode_generator_settings.barcode_generator_settings import (
+    get_barcode_settings,
+)
+from barcode_generator.barcode_generator.doctype.tenacity_serial_counter.tenacity_serial_counter import (
+    reserve_serial_numbers,
+)
 
 # Setup logger for debugging
 logger = frappe.logger("barcode_generator")
 
+BARCODE_ENDPOINT = "/api/method/barcode_generator.utils.api.barcode_image"
+
+# Upper bound on labels in one batch print request
+MAX_BATCH_LABELS = 10000
+
+# Single serial prints: one bordered 100x50mm label, centred horizontally near the top of an A4 page
+SERIAL_LABEL_SHEET = LabelSheet(210, 297, cell_width=100, cell_height=50, margin_left=(210 - 100) / 2, margin_top=20)
+
+
+class BarcodeSymbologyError(frappe.ValidationError):
+    """A serial cannot be encoded in the symbology chosen for it"""
+
 class BarcodeGenerator:
     """
     A class to generate and manage barcodes for ERPNext serial numbers.
@@ -19,45 +64,131 @@ class BarcodeGenerator:
 
     def __init__(self):
         """Initialize the barcode generator"""
-        pass
+        settings = get_barcode_settings()
+        self.default_symbology = settings.default_symbology or DEFAULT_SYMBOLOGY
+        self._item_symbologies = {}
 
-    """ def create_barcode_image(self, serial_no, barcode_type="code128"):
-        ""Generate a barcode image for the given serial number""
-        try:
-            # Create barcode instance
-            barcode_class = barcode.get_barcode_class(barcode_type)
-            barcode_instance = barcode_class(serial_no, writer=ImageWriter())
+        # Compact storage writes 1-bit PNGs at one pixel per module with maximum compression
+        self.compact_images = settings.image_storage_format == "Compact"
+        self.png_compress_level = 9 if self.compact_images else 6
 
-            # Generate barcode image
-            buffer = BytesIO()
-            barcode_instance.write(buffer)
-            buffer.seek(0)
+        # On-demand mode serves barcodes from the render endpoint instead of stored files
+        self.on_demand_images = settings.image_source == "On Demand"
+
+        # Archive mode packs a Purchase Receipt's images into one zip instead of loose files
+        self.archive_images = settings.image_source == "Receipt Archive"
+
+        # A fixed QR mask skips qrcode's eight-way mask search
+        mask_pattern = settings.qr_mask_pattern
+        set_qr_mask_pattern(None if mask_pattern in (None, "", "Automatic") else cint(mask_pattern))
+
+    def get_symbology(self, name=None):
+        """Return a registered symbology, falling back to the configured default"""
+        return get_symbology(name or self.default_symbology)
 
-            # Return the image for further processing
-            image = Image.open(buffer)
-            return image
+    def resolve_symbology(self, item_code=None, symbology=None, payload=None):
+        """
+        Pick the symbology for a serial: an explicit choice (e.g. the serial's own
+        custom_barcode_symbology) wins, then the item's custom_barcode_symbology
+        if that custom field exists, then the default from Barcode Generator Settings.
+        With `payload` (the serial number) it is also checked to be encodable, raising
+        BarcodeSymbologyError instead of failing later with an empty image or label.
+        """
+        symbology = self._resolve_symbology(item_code, symbology)
+        if payload is not None:
+            try:
+                self.get_symbology(symbology).validate_payload(payload)
+            except ValueError as e:
+                frappe.throw(
+                    f"Serial {payload} cannot be printed as {symbology}: {str(e)}. "
+                    f"Choose another Barcode Symbology for item {item_code or ''} or in Barcode Generator Settings.",
+                    BarcodeSymbologyError,
+                    title="Unsupported Barcode Symbology"
+                )
+        return symbology
+
+    def _resolve_symbology(self, item_code=None, symbology=None):
+        if symbology:
+            return symbology
+        if not item_code:
+            return self.default_symbology
+
+        if item_code not in self._item_symbologies:
+            item_symbology = None
+            if frappe.get_meta("Item").has_field("custom_barcode_symbology"):
+                item_symbology = frappe.get_cached_value("Item", item_code, "custom_barcode_symbology")
+            self._item_symbologies[item_code] = item_symbology or self.default_symbology
+        return self._item_symbologies[item_code]
+
+    def create_barcode_image(self, serial_no, symbology=None):
+        """Generate a barcode image for the given serial number"""
+        try:
+            return self.get_symbology(symbology).render(serial_no)
 
         except Exception as e:
             logger.error(f"Barcode generation error for {serial_no}: {str(e)}")
-            return None """
-    
-    def create_barcode_image(self, serial_no):
-        """Generate a barcode image for the given serial number"""
+            return None
+
+    def create_barcode_images(self, serial_nos, symbology=None):
+        """Generate barcode images for a list of serial numbers, in order"""
         try:
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(serial_no)
-            qr.make(fit=True)
+            return self.get_symbology(symbology).render_batch(serial_nos)
+
+        except Exception as e:
+            logger.error(f"Barcode batch generation error: {str(e)}")
+            return [self.create_barcode_image(serial_no, symbology) for serial_no in serial_nos]
+
+    def draw_barcode(self, pdf, serial_no, x, y, width, height, drawer, symbology=None):
+        """Draw a serial's barcode as vectors, fitted into the given box on a label PDF page"""
+        symbol = self.get_symbology(symbology)
+        box_x, box_y, box_w, box_h = symbol.fit_box(x, y, width, height)
+        drawer(pdf, symbol.get_matrix(serial_no), box_x, box_y, box_w, box_h)
+
+    def place_barcode_image(self, pdf, barcode_image, x, y, width, height, symbology=None):
+        """Place a barcode image (file path or PNG bytes), fitted into the given box on a label PDF page"""
+        if isinstance(barcode_image, bytes):
+            barcode_image = BytesIO(barcode_image)
+        box_x, box_y, box_w, box_h = self.get_symbology(symbology).fit_box(x, y, width, height)
+        pdf.image(barcode_image, box_x, box_y, w=box_w, h=box_h)
 
-            image = qr.make_image(fill_color="black", back_color="white")
-            return image
+    def get_cache_params(self, symbology=None):
+        """Size parameters that, with payload and symbology, identify a rendered PNG"""
+        symbol = self.get_symbology(symbology)
+        return (*symbol.get_raster_scale(self.compact_images), "png", *symbol.get_cache_variant())
 
+    def render_barcode_png(self, serial_no, symbology=None):
+        """Render a serial's barcode as PNG bytes in the configured storage format"""
+        return self.get_symbology(symbology).render_png(
+            serial_no, compress_level=self.png_compress_level, compact=self.compact_images
+        )
+
+    def load_barcode_png(self, serial_no, symbology=None, barcode_url=None):
+        """
+        Return PNG bytes for a serial's barcode. The stored file or archive member at
+        `barcode_url` is read if there is one, otherwise the barcode is rendered through
+        the image cache. Stored bytes are not cached: they may predate the current storage
+        format, and the cache key stands for an image rendered with the current settings.
+        """
+        symbology = symbology or self.default_symbology
+
+        try:
+            if barcode_url and barcode_url.startswith(ARCHIVE_URL_PREFIX):
+                archive_path, member = split_archive_member_url(barcode_url)
+                png = BarcodeArchive(archive_path).read(member)
+                if png:
+                    return png
+            if barcode_url and barcode_url.startswith(BARCODE_URL_PREFIX):
+                barcode_path = resolve_barcode_path(barcode_url)
+                if barcode_path:
+                    with open(barcode_path, "rb") as f:
+                        return f.read()
+
+            return get_image_cache().get_or_render(
+                serial_no, symbology, self.get_cache_params(symbology),
+                lambda: self.render_barcode_png(serial_no, symbology)
+            )
         except Exception as e:
-            logger.error(f"QR code generation error for {serial_no}: {str(e)}")
+            logger.error(f"Barcode generation error for {serial_no}: {str(e)}")
             return None
 
     """def create_qr_code(self, serial_no):
@@ -85,46 +216,302 @@ class BarcodeGenerator:
         image.save(buffer, format="PNG")
         return base64.b64encode(buffer.getvalue()).decode()
 
-    def save_or_get_barcode_image(self, serial_no):
+    def get_barcode_file_name(self, serial_no, symbology=None):
+        """QR images keep the original {serial_no}.png name, other symbologies get a suffix"""
+        symbology = symbology or self.default_symbology
+        if symbology == DEFAULT_SYMBOLOGY:
+            return f"{serial_no}.png"
+        return f"{serial_no}-{frappe.scrub(symbology)}.png"
+
+    def get_existing_barcode_url(self, serial_no, symbology=None):
+        """Return the file_url of a barcode already stored for this serial number, if any"""
+        return self.get_existing_barcode_urls([(serial_no, symbology)])[0]
+
+    def get_existing_barcode_urls(self, serials):
+        """
+        Resolve the stored barcode File records for a list of (serial_no, symbology) pairs
+        with a single query. Returns file URLs in input order, None where nothing is stored.
+        Matching is on the file name at the end of file_url, so it holds for any
+        directory layout under /files/barcodes.
+        """
+        if not serials:
+            return []
+
+        existing_files = frappe.get_all(
+            "File",
+            filters={
+                "attached_to_doctype": "Tenacity Serial No",
+                "attached_to_name": ["in", list({serial_no for serial_no, _ in serials})],
+                "file_url": ["like", "/files/barcodes/%"]
+            },
+            fields=["attached_to_name", "file_url"],
+            order_by="creation asc"
+        )
+
+        index = {}
+        for file in existing_files:
+            file_name = file.file_url.rsplit("/", 1)[-1]
+            index.setdefault((file.attached_to_name, file_name), file.file_url)
+
+        return [
+            index.get((serial_no, self.get_barcode_file_name(serial_no, symbology)))
+            for serial_no, symbology in serials
+        ]
+
+    def get_barcode_endpoint_url(self, serial_no, symbology=None):
+        """URL of the on-demand render endpoint for a serial's barcode"""
+        query = urlencode({"serial_no": serial_no, "symbology": symbology or self.default_symbology})
+        return f"{BARCODE_ENDPOINT}?{query}"
+
+    def save_or_get_barcode_image(self, serial_no, symbology=None):
         """Create a barcode image and save it to the file system, or retrieve existing one"""
         logger.info(f"Processing barcode wonderful for serial_no: {serial_no}")
+        if self.on_demand_images:
+            return self.get_barcode_endpoint_url(serial_no, symbology)
+
+        if self.archive_images:
+            # The image goes into the archive of the receipt the serial was minted for
+            archive_name = frappe.db.get_value("Tenacity Serial No", serial_no, "purchase_document_no")
+            if archive_name:
+                return self.save_or_get_barcode_images([(serial_no, symbology)], archive_name=archive_name)[0]
+
         try:
             # Check if barcode already exists for this serial number
-            existing_files = frappe.get_all(
-                "File",
-                filters={
-                    "attached_to_doctype": "Tenacity Serial No",
-                    "attached_to_name": serial_no,
-                    "file_name": f"barcodes/{serial_no}.png"
-                },
-                fields=["name", "file_url"]
-            )
-
-            if existing_files:
+            existing_url = self.get_existing_barcode_url(serial_no, symbology)
+            if existing_url:
                 logger.info(f"Existing barcode found for {serial_no}")
-                return existing_files[0].file_url
+                return existing_url
 
             # Generate new barcode image
             logger.info(f"Generating new barcode for {serial_no}")
-            barcode_image = self.create_barcode_image(serial_no)
+            barcode_image = self.load_barcode_png(serial_no, symbology)
 
             if not barcode_image:
                 logger.error(f"Failed to generate barcode for {serial_no}")
                 return None
 
-            # Define file path and name
-            file_url = f"/files/barcodes/{serial_no}.png"
-            file_name = f"{serial_no}.png"
+            return self.store_barcode_image(serial_no, barcode_image, symbology)
+
+        except Exception as e:
+            logger.error(f"Error in save_or_get_barcode_image for {serial_no}: {str(e)}")
+            return None
+
+    def save_or_get_barcode_images(self, serials, archive_name=None):
+        """
+        Batch version of save_or_get_barcode_image for a list of (serial_no, symbology) pairs.
+        Existing images are found with one query, so a fully generated batch costs O(1) queries.
+        Missing images are rendered together, on a process pool for large batches,
+        and written to storage from this process. Returns file URLs in input order,
+        None where a barcode could not be produced. In on-demand mode nothing is stored
+        and the render endpoint URLs are returned instead; in archive mode the images go
+        into the archive of `archive_name` (the Purchase Receipt).
+        """
+        if self.on_demand_images:
+            return [self.get_barcode_endpoint_url(serial_no, symbology) for serial_no, symbology in serials]
+
+        if self.archive_images and archive_name:
+            return self.save_or_get_archived_images(serials, archive_name)
+
+        settings = get_barcode_settings()
+
+        # One query resolves every barcode already on file; only the rest are rendered
+        urls = self.get_existing_barcode_urls(serials)
+        missing = [idx for idx, url in enumerate(urls) if not url]
+
+        if not missing:
+            return urls
+
+        images = self.render_missing_pngs(serials, missing)
+
+        # Write the image files, then record them all with one set-based write-back
+        stored = []
+        for idx in missing:
+            serial_no, symbology = serials[idx]
+            png = images[idx]
+            if not png:
+                logger.error(f"Failed to generate barcode for {serial_no}")
+                continue
+
+            file_name = self.get_barcode_file_name(serial_no, symbology)
+            file_url = get_barcode_file_url(file_name)
+            try:
+                write_barcode_file(file_url, png)
+            except Exception as e:
+                logger.error(f"Error saving barcode image for {serial_no}: {str(e)}")
+                continue
+
+            stored.append({"serial_no": serial_no, "file_name": file_name, "file_url": file_url, "content": png})
+            urls[idx] = file_url
+
+        self.write_back_barcode_images(stored, chunk_size=settings.bulk_insert_chunk_size)
+        return urls
+
+    def save_or_get_archived_images(self, serials, archive_name):
+        """
+        Archive-mode version of save_or_get_barcode_images. The archive's offset table
+        tells which images are already packed; the rest are rendered and appended in input
+        order, so the archive stays in label order. Returns archive member URLs
+        (/files/barcode_archives/<receipt>.zip#<file name>) in input order.
+        """
+        archive = BarcodeArchive(get_barcode_file_path(get_archive_url(archive_name)))
+        created = not archive.exists()
+        index = archive.get_index()
+
+        members = [self.get_barcode_file_name(serial_no, symbology) for serial_no, symbology in serials]
+        missing = [idx for idx, member in enumerate(members) if member not in index]
+
+        if missing:
+            images = self.render_missing_pngs(serials, missing)
+            packed = []
+            for idx in missing:
+                if images[idx]:
+                    packed.append((members[idx], images[idx]))
+                else:
+                    logger.error(f"Failed to generate barcode for {serials[idx][0]}")
+                    members[idx] = None
+
+            archive.append(packed)
+            logger.info(f"Packed {len(packed)} barcode images into {archive.path}")
+
+            if created and archive.exists():
+                frappe.get_doc({
+                    "doctype": "File",
+                    "file_name": f"{archive_name}.zip",
+                    "file_url": get_archive_url(archive_name),
+                    "attached_to_doctype": "Purchase Receipt",
+                    "attached_to_name": archive_name
+                }).insert(ignore_permissions=True)
+
+        return [get_archive_member_url(archive_name, member) if member else None for member in members]
+
+    def read_archived_pngs(self, archive_name, barcodes):
+        """
+        Yield PNG bytes for each barcode entry in order, reading the receipt archive front to
+        back in one pass. Images are appended in label order, so the member for the next label
+        is normally the next one in the file; anything not found is loaded individually.
+        """
+        archive = BarcodeArchive(get_barcode_file_path(get_archive_url(archive_name)))
+        members = archive.iter_members() if archive.exists() else iter(())
+        pending = {}
+
+        for barcode in barcodes:
+            url = barcode.get("barcode_url") or ""
+            member = url.split("#", 1)[1] if url.startswith(ARCHIVE_URL_PREFIX) and "#" in url else None
+
+            if member and member not in pending:
+                for name, png in members:
+                    pending[name] = png
+                    if name == member:
+                        break
 
-            # Ensure the barcode folder exists
-            barcode_folder = frappe.get_site_path('public', 'files', 'barcodes')
-            if not os.path.exists(barcode_folder):
-                os.makedirs(barcode_folder)
-                logger.info(f"Created barcode folder: {barcode_folder}")
+            png = pending.pop(member, None)
+            yield png or self.load_barcode_png(barcode["serial_no"], barcode.get("symbology"), url)
+
+    def render_missing_pngs(self, serials, missing):
+        """
+        Return {index: PNG bytes or None} for the given indices of `serials`,
+        rendering on a process pool for large batches.
+        """
+        settings = get_barcode_settings()
+
+        # Reprints are served from the image cache; only true misses go to the renderer
+        cache = get_image_cache()
+        images = {}
+        to_render = []
+        for idx in missing:
+            serial_no, symbology = serials[idx]
+            symbology = symbology or self.default_symbology
+            key = cache.make_key(serial_no, symbology, self.get_cache_params(symbology))
+            images[idx] = cache.get(key)
+            if images[idx] is None:
+                to_render.append((idx, key))
+
+        if to_render:
+            logger.info(f"Rendering {len(to_render)} new barcodes")
+            rendered = render_pngs(
+                [
+                    (serials[idx][0], serials[idx][1] or self.default_symbology,
+                     self.png_compress_level, self.compact_images)
+                    for idx, _ in to_render
+                ],
+                processes=cint(settings.render_processes),
+                threshold=cint(settings.parallel_render_threshold),
+                use_pool=in_background_job()
+            )
+            for (idx, key), png in zip(to_render, rendered, strict=True):
+                images[idx] = png
+                if png:
+                    cache.set(key, png)
+
+        return images
+
+    def write_back_barcode_images(self, stored, chunk_size=500):
+        """
+        Record a batch of written barcode images in the database: File rows go in with
+        multi-row inserts and custom_barcode_image is set for every serial with one
+        UPDATE per chunk, instead of a File insert plus a full serial save per image.
+        `stored` is a list of dicts with serial_no, file_name, file_url and content.
+        """
+        if not stored:
+            return
+
+        chunk_size = cint(chunk_size) or 500
+        timestamp = now()
+        user = frappe.session.user
+
+        frappe.db.bulk_insert(
+            "File",
+            [
+                "name", "owner", "modified_by", "creation", "modified", "docstatus",
+                "file_name", "file_url", "attached_to_doctype", "attached_to_name",
+                "is_private", "folder", "file_size", "content_hash"
+            ],
+            [
+                (
+                    frappe.generate_hash(length=10), user, user, timestamp, timestamp, 0,
+                    row["file_name"], row["file_url"], "Tenacity Serial No", row["serial_no"],
+                    0, "Home/Attachments", len(row["content"]), hashlib.md5(row["content"]).hexdigest()
+                )
+                for row in stored
+            ],
+            chunk_size=chunk_size
+        )
+
+        # Update Serial No with barcode image reference (if custom field exists)
+        if not frappe.db.has_column("Tenacity Serial No", "custom_barcode_image"):
+            return
+
+        for offset in range(0, len(stored), chunk_size):
+            chunk = stored[offset:offset + chunk_size]
+            frappe.db.sql(
+                f"""
+                UPDATE `tabTenacity Serial No`
+                SET custom_barcode_image = CASE name {" ".join(["WHEN %s THEN %s"] * len(chunk))} END
+                WHERE name IN ({", ".join(["%s"] * len(chunk))})
+                """,
+                [value for row in chunk for value in (row["serial_no"], row["file_url"])]
+                + [row["serial_no"] for row in chunk]
+            )
+
+        logger.info(f"Wrote back {len(stored)} barcode images")
+
+    def store_barcode_image(self, serial_no, barcode_image, symbology=None):
+        """
+        Save a rendered barcode (PIL image or PNG bytes) under public/files/barcodes,
+        attach it to the serial with a File document and set custom_barcode_image.
+        """
+        try:
+            # Define file path and name (flat or hash-sharded, per settings)
+            file_name = self.get_barcode_file_name(serial_no, symbology)
+            file_url = get_barcode_file_url(file_name)
 
             # Save the barcode image
             try:
-                barcode_image.save(os.path.join(barcode_folder, file_name))
+                if not isinstance(barcode_image, bytes):
+                    buffer = BytesIO()
+                    barcode_image.save(buffer, format="PNG")
+                    barcode_image = buffer.getvalue()
+                write_barcode_file(file_url, barcode_image)
                 logger.info(f"Saved barcode image to {file_url}")
             except Exception as e:
                 logger.error(f"Error saving barcode image for {serial_no}: {str(e)}")
@@ -158,14 +545,166 @@ class BarcodeGenerator:
             return file_url
 
         except Exception as e:
-            logger.error(f"Error in save_or_get_barcode_image for {serial_no}: {str(e)}")
+            logger.error(f"Error in store_barcode_image for {serial_no}: {str(e)}")
             return None
 
-def generate_barcodes_for_stock_entry(stock_entry_name):
+def compact_stored_barcode_images(batch_size=500):
+    """
+    Rewrite existing images under public/files/barcodes in the compact 1-bit format.
+    File names and URLs stay the same, so File documents and custom_barcode_image
+    need no changes. Run with bench execute after switching Image Storage Format to Compact.
+    """
+    generator = BarcodeGenerator()
+    generator.compact_images = True
+    generator.png_compress_level = 9
+    symbology_suffixes = {f"-{frappe.scrub(name)}": name for name in SYMBOLOGIES if name != DEFAULT_SYMBOLOGY}
+
+    batch_size = cint(batch_size) or 500
+    rewritten = 0
+    saved_bytes = 0
+    offset = 0
+    # One page of File rows at a time, so memory stays flat however many images are stored.
+    # Files are rewritten in place and no row changes, so offsets stay stable between pages.
+    while True:
+        files = frappe.get_all(
+            "File",
+            filters={"attached_to_doctype": "Tenacity Serial No", "file_url": ["like", "/files/barcodes/%"]},
+            fields=["attached_to_name", "file_url"],
+            order_by="creation asc, name asc",
+            limit_start=offset,
+            limit_page_length=batch_size
+        )
+        if not files:
+            break
+        offset += len(files)
+
+        for file in files:
+            serial_no = file.attached_to_name
+            stem = file.file_url.rsplit("/", 1)[-1][:-len(".png")]
+            suffix = stem[len(serial_no):]
+            symbology = symbology_suffixes.get(suffix, DEFAULT_SYMBOLOGY)
+
+            path = resolve_barcode_path(file.file_url)
+            if not path:
+                continue
+
+            try:
+                png = generator.render_barcode_png(serial_no, symbology)
+                saved_bytes += os.path.getsize(path) - len(png)
+                with open(path, "wb") as f:
+                    f.write(png)
+                rewritten += 1
+            except Exception as e:
+                logger.error(f"Could not compact barcode image for {serial_no}: {str(e)}")
+
+    logger.info(f"Compacted {rewritten} barcode images, saving {saved_bytes} bytes")
+    return {"rewritten": rewritten, "saved_bytes": saved_bytes}
+
+def bulk_insert_serials(stock_entry_name, serials, chunk_size=500):
+    """
+    Write Tenacity Serial No records with multi-row inserts, `chunk_size` rows per statement.
+    Serial numbers are used as document names, matching how the rest of the app
+    looks serials up. Field defaults from the doctype are applied, document hooks are not.
+    """
+    if not serials:
+        return
+
+    doctype = "Tenacity Serial No"
+    template = frappe.new_doc(doctype)
+    defaults = {
+        df.fieldname: template.get(df.fieldname)
+        for df in frappe.get_meta(doctype).fields
+        if df.default and template.get(df.fieldname) is not None
+        and df.fieldname not in ("serial_no", "item_code", "purchase_document_no")
+    }
+
+    timestamp = now()
+    user = frappe.session.user
+    fields = [
+        "name", "owner", "modified_by", "creation", "modified", "docstatus",
+        "serial_no", "item_code", "purchase_document_no", *defaults.keys()
+    ]
+    values = [
+        (
+            serial["serial_no"], user, user, timestamp, timestamp, 0,
+            serial["serial_no"], serial["item_code"], stock_entry_name, *defaults.values()
+        )
+        for serial in serials
+    ]
+
+    frappe.db.bulk_insert(doctype, fields, values, chunk_size=cint(chunk_size) or 500)
+    logger.info(f"Bulk inserted {len(values)} Tenacity Serial No records for {stock_entry_name}")
+
+def mint_serials_for_stock_entry(stock_entry, existing_serials, chunk_size=None, progress=None):
+    """
+    Create the Tenacity Serial No records still missing for a Purchase Receipt.
+    Only the shortfall between each item's received qty and its existing serials is minted,
+    so a run interrupted after a committed chunk picks up where it stopped.
+    With `chunk_size`, numbers are reserved, inserted and committed `chunk_size` serials at a time.
+    """
+    settings = get_barcode_settings()
+
+    # Work out how many serials each item still needs
+    required = {}
+    for item in stock_entry.get("items"):
+        qty = int(item.qty)  # Assuming qty is an integer
+        if qty > 0:
+            required[item.item_code] = required.get(item.item_code, 0) + qty
+
+    for serial in existing_serials:
+        if serial["item_code"] in required:
+            required[serial["item_code"]] -= 1
+
+    total = sum(qty for qty in required.values() if qty > 0)
+    minted = []
+
+    for item_code, qty in required.items():
+        while qty > 0:
+            block = min(qty, cint(chunk_size)) if chunk_size else qty
+
+            # Reserve the whole block of numbers for this item in one locked step
+            first_serial = reserve_serial_numbers(item_code, block)
+
+            # Format serial numbers: Tenacity-item_code-#### (padded to 4 digits)
+            new_serials = [
+                {"serial_no": f"Tenacity-{item_code}-{serial_count:04d}", "item_code": item_code}
+                for serial_count in range(first_serial, first_serial + block)
+            ]
+
+            if settings.bulk_minting:
+                bulk_insert_serials(stock_entry.name, new_serials, settings.bulk_insert_chunk_size)
+                for serial in new_serials:
+                    minted.append({"name": serial["serial_no"], **serial})
+            else:
+                for serial in new_serials:
+                    # Create new Tenacity Serial No document
+                    serial_doc = frappe.get_doc({
+                        "doctype": "Tenacity Serial No",
+                        "serial_no": serial["serial_no"],
+                        "item_code": serial["item_code"],
+                        "purchase_document_no": stock_entry.name
+                    })
+                    serial_doc.insert(ignore_permissions=True)
+                    logger.info(f"Created Tenacity Serial No: {serial['serial_no']} with name {serial_doc.name}")
+                    minted.append({"name": serial_doc.name, **serial})
+
+            qty -= block
+            if chunk_size:
+                frappe.db.commit()
+            if progress:
+                progress("serials", len(minted), total)
+
+    return minted
+
+def generate_barcodes_for_stock_entry(stock_entry_name, chunk_size=None, progress=None, render_images=True):
     frappe.log_error(f"Starting barcode generation for: {stock_entry_name}", "Barcode Generator")
     """
     Generate barcodes for serial numbers linked to a stock entry via purchase_document_no.
     Creates new serial numbers in Tenacity Serial No doctype if none exist.
+    Background jobs pass `chunk_size` to commit every `chunk_size` serials, and a
+    `progress(stage, done, total)` callable to report how far the run has got.
+    With `render_images=False` only the serials are ensured and every entry's barcode_url is None,
+    for callers that draw the QR code themselves or render the images as they stream.
     """
     try:
         # Get the stock entry
@@ -174,72 +713,69 @@ def generate_barcodes_for_stock_entry(stock_entry_name):
         barcode_urls = []
 
         # Fetch serial numbers where purchase_document_no matches the stock entry name
+        serial_fields = ["name", "serial_no", "item_code"]
+        if frappe.get_meta("Tenacity Serial No").has_field("custom_barcode_symbology"):
+            serial_fields.append("custom_barcode_symbology")
+
         serial_nos = frappe.get_all(
             "Tenacity Serial No",
             filters={"purchase_document_no": stock_entry_name},
-            fields=["name", "serial_no", "item_code"]
+            fields=serial_fields,
+            order_by="creation asc, name asc"
         )
 
-        # If no serial numbers exist, create them
-        if not serial_nos:
-            # Get items from stock entry
-            items = stock_entry.get("items")
-            if not items:
-                frappe.log_error(f"No items found in stock entry {stock_entry_name}", "Barcode Generator")
-                return []
-
-            for item in items:
-                item_code = item.item_code
-                qty = int(item.qty)  # Assuming qty is an integer
-
-                # Generate serial numbers for each item based on qty
-                for i in range(qty):
-                    # Get the last serial number for this item_code to determine the next number
-                    last_serial = frappe.get_all(
-                        "Tenacity Serial No",
-                        filters={"item_code": item_code},
-                        fields=["serial_no"],
-                        order_by="creation desc",
-                        limit=1
-                    )
-
-                    # Extract the serial number part (####) or start from 0
-                    if last_serial:
-                        last_no = last_serial[0]["serial_no"].split('-')[-1]
-                        try:
-                            serial_count = int(last_no) + 1
-                        except ValueError:
-                            serial_count = 1
-                    else:
-                        serial_count = 1
+        if not serial_nos and not stock_entry.get("items"):
+            frappe.log_error(f"No items found in stock entry {stock_entry_name}", "Barcode Generator")
+            return []
 
-                    # Format serial number: Tenacity-item_code-#### (padded to 4 digits)
-                    serial_no = f"Tenacity-{item_code}-{serial_count:04d}"
+        # Create any serial numbers that are still missing
+        serial_nos += mint_serials_for_stock_entry(
+            stock_entry, serial_nos, chunk_size=chunk_size, progress=progress
+        )
+        # Commit the serials and release the counter row locks before any rendering,
+        # so other receipts minting the same items do not wait on this one's images
+        frappe.db.commit()
 
-                    # Create new Tenacity Serial No document
-                    serial_doc = frappe.get_doc({
-                        "doctype": "Tenacity Serial No",
-                        "serial_no": serial_no,
-                        "item_code": item_code,
-                        "purchase_document_no": stock_entry_name
+        if not render_images:
+            return [
+                {
+                    "serial_no": serial["serial_no"],
+                    "item_code": serial["item_code"],
+                    "symbology": generator.resolve_symbology(
+                        serial["item_code"], serial.get("custom_barcode_symbology"), serial["serial_no"]
+                    ),
+                    "barcode_url": None
+                }
+                for serial in serial_nos
+            ]
+
+        # Process the serial numbers chunk by chunk; each chunk renders as one batch
+        step = cint(chunk_size) or len(serial_nos)
+        for offset in range(0, len(serial_nos), step):
+            chunk = [
+                (serial, generator.resolve_symbology(
+                    serial["item_code"], serial.get("custom_barcode_symbology"), serial["serial_no"]
+                ))
+                for serial in serial_nos[offset:offset + step]
+            ]
+            # Generate or get existing barcodes
+            urls = generator.save_or_get_barcode_images(
+                [(serial["serial_no"], symbology) for serial, symbology in chunk], archive_name=stock_entry_name
+            )
+
+            for (serial, symbology), barcode_url in zip(chunk, urls, strict=True):
+                if barcode_url:
+                    barcode_urls.append({
+                        "serial_no": serial["serial_no"],
+                        "item_code": serial["item_code"],  # Use dictionary key access
+                        "symbology": symbology,
+                        "barcode_url": barcode_url
                     })
-                    serial_doc.insert(ignore_permissions=True)
-                    logger.info(f"Created Tenacity Serial No: {serial_no} with name {serial_doc.name}")
-
-                    # Add to serial_nos list for barcode generation
-                    serial_nos.append({"name": serial_doc.name, "serial_no": serial_no, "item_code": item_code})
-
-        # Process each serial number
-        for serial in serial_nos:
-            serial_no = serial["serial_no"]  # Use dictionary key access
-            # Generate or get existing barcode
-            barcode_url = generator.save_or_get_barcode_image(serial_no)
-            if barcode_url:
-                barcode_urls.append({
-                    "serial_no": serial_no,
-                    "item_code": serial["item_code"],  # Use dictionary key access
-                    "barcode_url": barcode_url
-                })
+
+            if chunk_size:
+                frappe.db.commit()
+            if progress:
+                progress("images", offset + len(chunk), len(serial_nos))
 
         if not barcode_urls:
             frappe.log_error(f"No serial numbers processed for stock entry {stock_entry_name}", "Barcode Generator")
@@ -248,172 +784,596 @@ def generate_barcodes_for_stock_entry(stock_entry_name):
         frappe.db.commit()
         return barcode_urls
 
+    except BarcodeSymbologyError:
+        frappe.db.rollback()
+        raise
+
     except Exception as e:
         frappe.db.rollback()
         frappe.log_error(f"Error generating barcodes: {str(e)}", "Barcode Generator")
         return []
         
-def print_barcodes_for_stock_entry(stock_entry_name):
-    """Generate a PDF with one barcode per page for a stock entry, compatible with label printers"""
+def get_label_render_context(barcodes, company=None):
+    """
+    Resolve what every label in a run shares before the first page is drawn:
+    the item names for the whole batch with one query, and the company logo, decoded once.
+    """
+    item_codes = list({barcode['item_code'] for barcode in barcodes})
+    item_names = {}
+    if item_codes:
+        item_names = dict(frappe.get_all(
+            "Item", filters={"name": ["in", item_codes]}, fields=["name", "item_name"], as_list=True
+        ))
+
+    logo = load_company_logo(company)
+    logo_digest = hashlib.sha1(logo.tobytes()).hexdigest() if logo else None
+    return frappe._dict(item_names=item_names, logo=logo, logo_digest=logo_digest)
+
+def load_company_logo(company):
+    """Return the company's logo as a decoded PIL image, or None if it has none or it cannot be read"""
+    company_logo = frappe.get_cached_value("Company", company, "company_logo") if company else None
+    if not company_logo:
+        return None
+
+    logo_path = frappe.get_site_path('public', company_logo.lstrip('/'))
+    if not os.path.exists(logo_path):
+        return None
+
     try:
-        # Check if PDF already exists for this stock entry
-        existing_files = frappe.get_all(
-            "File",
-            filters={
-                "attached_to_doctype": "Purchase Receipt",
-                "attached_to_name": stock_entry_name,
-                "file_name": f"{stock_entry_name}_barcodes.pdf"
-            },
-            fields=["name", "file_url"]
-        )
+        logo = Image.open(logo_path)
+        logo.load()
+        return logo
+    except Exception as e:
+        logger.error(f"Could not read company logo {company_logo}: {str(e)}")
+        return None
+
+def render_label(pdf, generator, plan, barcode, context, draw_qr=None, barcode_png=None, transform=None):
+    """Draw one label from a compiled template plan, placing the barcode as vectors or as its PNG"""
+    def draw_barcode(pdf, x, y, width, height):
+        if draw_qr:
+            generator.draw_barcode(pdf, barcode['serial_no'], x, y, width, height, draw_qr, barcode.get('symbology'))
+        elif barcode_png:
+            generator.place_barcode_image(pdf, barcode_png, x, y, width, height, barcode.get('symbology'))
+
+    draw_label(pdf, plan, get_label_fields(barcode, context), context.logo, draw_barcode, transform)
+
+def get_label_fields(barcode, context):
+    """Values label template text can refer to"""
+    return {
+        "serial_no": barcode['serial_no'],
+        "item_code": barcode['item_code'],
+        "item_name": context.item_names.get(barcode['item_code']) or barcode['item_code'],
+    }
+
+def print_barcodes_for_stock_entry(stock_entry_name, chunk_size=None, progress=None):
+    """
+    Generate a PDF with one barcode per page for a stock entry, compatible with label printers.
+    `chunk_size` and `progress` are passed through to generate_barcodes_for_stock_entry.
+    When Label Output is ZPL or EPL the labels go to the thermal printer path instead.
+
+    The PDF is reused while its content hash (serials, item names, template, sheet, logo and
+    drawing mode) is unchanged. When serials were only appended since, the new labels are added
+    to the existing file as an incremental update; any other change rebuilds it.
+    """
+    if get_barcode_settings().label_output in THERMAL_LANGUAGES:
+        return print_thermal_labels_for_stock_entry(stock_entry_name, chunk_size=chunk_size, progress=progress)
+
+    try:
+        # Vector modes draw the QR modules straight into the page, so no PNGs are needed
+        settings = get_barcode_settings()
+        draw_qr = QR_DRAWERS.get(settings.qr_drawing)
+        generator = BarcodeGenerator()
 
-        if existing_files:
-            frappe.log_error(f"Existing barcode PDF found for {stock_entry_name}: {existing_files[0].file_url}", "Barcode Generator")
-            return existing_files[0].file_url
-        
         # First, ensure barcodes are generated
-        barcodes = generate_barcodes_for_stock_entry(stock_entry_name)
+        barcodes = generate_barcodes_for_stock_entry(
+            stock_entry_name, chunk_size=chunk_size, progress=progress, render_images=not draw_qr
+        )
         
         if not barcodes:
             frappe.log_error(f"No serial numbers found for stock entry {stock_entry_name}", "Barcode Generator")
             return None
         
-        # Create a PDF document - Use custom dimensions for label printer (100mm x 50mm)
-        pdf = FPDF(orientation='L', unit='mm', format=(50, 100))
-        
-        # Get company logo for branding
+        # Item names and the company logo are resolved once for the whole run
         company = frappe.get_value("Purchase Receipt", stock_entry_name, "company")
-        company_logo = frappe.get_value("Company", company, "company_logo") if company else None
-        logo_path = None
-        
-        if company_logo:
-            logo_path = frappe.get_site_path('public', company_logo.lstrip('/'))
-            if not os.path.exists(logo_path):
-                logo_path = None
-        
-        # Create each barcode on its own page
-        for barcode in barcodes:
-            # Add a new page for each barcode
-            pdf.add_page()
-            
-            # Set margins
-            margin_x = 3  # Reduced left margin for text
-            margin_y = 5
-            label_width = 100
-            label_height = 50
-            text_width = 40  # Reduced text area to allow larger QR code
-            qr_width = 57   # Increased QR code area (100 - 40 - 3)
-            
-            # Add company logo if available (in the top-left)
-            if logo_path and os.path.exists(logo_path):
-                pdf.image(logo_path, margin_x, margin_y, w=15)
-                text_start_y = margin_y + 15
-            else:
-                text_start_y = margin_y
-            
-            # Add only item name (removed item_code display)
-            item_name = frappe.get_value("Item", barcode['item_code'], "item_name") or barcode['item_code']
-            pdf.set_xy(margin_x + 1, text_start_y + 5)
-            pdf.set_font("Arial", style="B", size=12)  # Reduced font size from 18 to 12
-            pdf.multi_cell(w=35, h=4, txt=f"{item_name}", align='L')            
-    
-            # Add QR code image (right side, larger size)
-            barcode_path = frappe.get_site_path('public', barcode['barcode_url'].lstrip('/'))
-            if os.path.exists(barcode_path):
-                # Position QR code on the right, centered vertically
-                qr_x = margin_x + text_width
-                qr_y = margin_y
-                qr_size = label_height - 2 * margin_y  # 40mm to fit height minus margins
-                pdf.image(barcode_path, qr_x, qr_y, w=qr_size, h=qr_size)
-        
-        # Save the PDF
-        pdf_folder = frappe.get_site_path('public', 'files', 'barcode_prints')
-        if not os.path.exists(pdf_folder):
-            os.makedirs(pdf_folder)
-        
-        file_path = os.path.join(pdf_folder, f"{stock_entry_name}_barcodes.pdf")
-        pdf.output(file_path)
-        
-        # Create File document
-        file_url = f"/files/barcode_prints/{stock_entry_name}_barcodes.pdf"
-        file_doc = frappe.get_doc({
-            "doctype": "File",
-            "file_name": f"{stock_entry_name}_barcodes.pdf",
-            "file_url": file_url,
-            "attached_to_doctype": "Purchase Receipt",
-            "attached_to_name": stock_entry_name
+        context = get_label_render_context(barcodes, company)
+
+        # The 100x50mm label layout is compiled once; labels go one per page or N-up on a sheet
+        plan = compile_label_template("Stock Entry", bool(context.logo))
+        sheet = get_label_sheet(settings.label_sheet, "Stock Entry")
+        slots = iter_label_slots(sheet, "Stock Entry")
+
+        file_name = f"{stock_entry_name}_barcodes.pdf"
+        file_url = f"/files/barcode_prints/{file_name}"
+        file_path = frappe.get_site_path('public', 'files', 'barcode_prints', file_name)
+
+        # Compare the content hash with the one the existing PDF was built from
+        layout_digest = get_label_layout_digest("Stock Entry", settings, generator, context)
+        label_digests = [get_label_digest(barcode, context) for barcode in barcodes]
+        manifest = load_label_manifest(stock_entry_name) if os.path.exists(file_path) else None
+        resume = None
+        printed = 0
+
+        if manifest and manifest["layout"] == layout_digest:
+            previous = manifest["labels"]
+            if previous == label_digests:
+                frappe.log_error(f"Existing barcode PDF found for {stock_entry_name}: {file_url}", "Barcode Generator")
+                attach_label_pdf(stock_entry_name, file_name, file_url)
+                return file_url
+
+            # Serials only appended, and the last sheet is full: add the new pages to the file
+            if label_digests[:len(previous)] == previous and len(previous) % sheet.labels_per_page == 0:
+                resume = manifest["pdf"]
+                printed = len(previous)
+
+        # Archived images are streamed from the receipt's archive in a single sequential pass
+        archived_pngs = None
+        if generator.archive_images and not draw_qr:
+            archived_pngs = generator.read_archived_pngs(stock_entry_name, barcodes[printed:])
+
+        # Pages are written to the file as they are finished, so memory stays flat for any run size
+        with StreamingLabelPDF(file_path, sheet.page_width, sheet.page_height, resume=resume) as pdf:
+            for page_no, barcode in enumerate(barcodes[printed:], start=printed + 1):
+                new_page, transform = next(slots)
+                if new_page:
+                    pdf.add_page()
+
+                barcode_png = None
+                if not draw_qr:
+                    if archived_pngs is not None:
+                        barcode_png = next(archived_pngs)
+                    else:
+                        barcode_png = generator.load_barcode_png(
+                            barcode['serial_no'], barcode.get('symbology'), barcode['barcode_url']
+                        )
+
+                render_label(pdf, generator, plan, barcode, context, draw_qr, barcode_png, transform)
+
+                if progress and (page_no % 50 == 0 or page_no == len(barcodes)):
+                    progress("pages", page_no, len(barcodes))
+
+        save_label_manifest(stock_entry_name, {
+            "layout": layout_digest,
+            "labels": label_digests,
+            "pdf": pdf.get_state()
         })
-        file_doc.insert(ignore_permissions=True)
-        
-        frappe.log_error(f"Generated new barcode PDF for {stock_entry_name}: {file_url}", "Barcode Generator")
+        attach_label_pdf(stock_entry_name, file_name, file_url)
+
+        if printed:
+            frappe.log_error(f"Appended {len(barcodes) - printed} labels to barcode PDF for {stock_entry_name}: {file_url}", "Barcode Generator")
+        else:
+            frappe.log_error(f"Generated new barcode PDF for {stock_entry_name}: {file_url}", "Barcode Generator")
         return file_url
     
+    except BarcodeSymbologyError:
+        frappe.db.rollback()
+        raise
+
     except Exception as e:
         frappe.log_error(f"Error generating barcode PDF: {str(e)}", "Barcode Generator")
         return None
         
-def print_barcode_for_serial_no(serial_no):
-    """Generate a PDF with a single barcode for a serial number"""
+def get_label_digest(barcode, context):
+    """Hash of everything that ends up on one label"""
+    raw = "\x1f".join([
+        barcode['serial_no'],
+        barcode['item_code'],
+        context.item_names.get(barcode['item_code']) or "",
+        barcode.get('symbology') or ""
+    ])
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+def get_label_layout_digest(template, settings, generator, context):
+    """Hash of everything every label of a run shares: layout, sheet, logo and barcode drawing"""
+    raw = json.dumps([
+        template,
+        LABEL_TEMPLATES[template],
+        settings.label_sheet,
+        settings.qr_drawing,
+        generator.compact_images,
+        context.logo_digest
+    ], default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+def get_label_manifest_path(stock_entry_name):
+    return frappe.get_site_path('private', 'barcode_prints', f"{stock_entry_name}_barcodes.json")
+
+def load_label_manifest(stock_entry_name):
+    """Return the content hashes and PDF state a stock entry's label PDF was built from, if any"""
     try:
-        # Get the serial number details
-        serial = frappe.get_doc("Tenacity Serial No", serial_no)
-        generator = BarcodeGenerator()
+        with open(get_label_manifest_path(stock_entry_name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
-        # Generate or get existing barcode
-        barcode_url = generator.save_or_get_barcode_image(serial_no)
-        if not barcode_url:
+def save_label_manifest(stock_entry_name, manifest):
+    path = get_label_manifest_path(stock_entry_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.part", "w") as f:
+        json.dump(manifest, f)
+    os.replace(f"{path}.part", path)
+
+def attach_label_pdf(stock_entry_name, file_name, file_url):
+    """Attach a stock entry's label file (PDF or thermal job) to it, once"""
+    if frappe.db.exists("File", {
+        "attached_to_doctype": "Purchase Receipt",
+        "attached_to_name": stock_entry_name,
+        "file_url": file_url
+    }):
+        return
+
+    # Create File document
+    frappe.get_doc({
+        "doctype": "File",
+        "file_name": file_name,
+        "file_url": file_url,
+        "attached_to_doctype": "Purchase Receipt",
+        "attached_to_name": stock_entry_name
+    }).insert(ignore_permissions=True)
+
+def print_thermal_labels_for_stock_entry(stock_entry_name, chunk_size=None, progress=None):
+    """
+    Emit a stock entry's labels as ZPL or EPL, using the printer's built-in barcode commands.
+    With a Printer Host in Barcode Generator Settings the job is streamed to its raw TCP port
+    and {"printer": ..., "labels": ...} is returned; otherwise the job is saved as a file
+    attached to the Purchase Receipt and its URL is returned.
+    """
+    try:
+        settings = get_barcode_settings()
+
+        # The printer draws the barcodes itself, so no images are rendered
+        barcodes = generate_barcodes_for_stock_entry(
+            stock_entry_name, chunk_size=chunk_size, progress=progress, render_images=False
+        )
+        if not barcodes:
+            frappe.log_error(f"No serial numbers found for stock entry {stock_entry_name}", "Barcode Generator")
             return None
 
-        # Create a PDF document
-        pdf = FPDF(orientation='P', unit='mm', format='A4')
-        pdf.add_page()
+        company = frappe.get_value("Purchase Receipt", stock_entry_name, "company")
+        context = get_label_render_context(barcodes, company)
+        plan = compile_label_template("Stock Entry", bool(context.logo))
+        renderer = ThermalLabelRenderer(settings.label_output, cint(settings.printer_dpi) or 203)
 
-        # Define constants
-        label_width = 100
-        label_height = 50
-        margin_x = (210 - label_width) / 2  # Center horizontally
-        margin_y = 20
+        def job():
+            yield renderer.job_header(plan, context.logo)
+            for label_no, barcode in enumerate(barcodes, start=1):
+                yield renderer.render(plan, get_label_fields(barcode, context), barcode.get('symbology'))
+                if progress and (label_no % 50 == 0 or label_no == len(barcodes)):
+                    progress("pages", label_no, len(barcodes))
 
-        # Get company logo for branding
-        company = frappe.get_value("Tenacity Serial No", serial_no, "company")
-        company_logo = frappe.get_value("Company", company, "company_logo") if company else None
-        logo_path = None
+        if settings.printer_host:
+            port = cint(settings.printer_port) or 9100
+            send_to_printer(job(), settings.printer_host, port)
+            frappe.log_error(f"Sent {len(barcodes)} labels for {stock_entry_name} to {settings.printer_host}:{port}", "Barcode Generator")
+            return {"printer": f"{settings.printer_host}:{port}", "labels": len(barcodes)}
 
-        if company_logo:
-            logo_path = frappe.get_site_path('public', company_logo.lstrip('/'))
+        file_name = f"{stock_entry_name}_labels.{settings.label_output.lower()}"
+        file_url = f"/files/barcode_prints/{file_name}"
+        file_path = frappe.get_site_path('public', 'files', 'barcode_prints', file_name)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(f"{file_path}.part", "w", encoding="utf-8") as f:
+            for chunk in job():
+                f.write(chunk)
+        os.replace(f"{file_path}.part", file_path)
 
-        # Draw label border
-        pdf.rect(margin_x, margin_y, label_width, label_height)
+        attach_label_pdf(stock_entry_name, file_name, file_url)
 
-        # Add company logo if available
-        if logo_path and os.path.exists(logo_path):
-            pdf.image(logo_path, margin_x + 5, margin_y + 5, w=15)
-            start_y = margin_y + 15
-        else:
-            start_y = margin_y + 5
+        return file_url
+
+    except BarcodeSymbologyError:
+        frappe.db.rollback()
+        raise
+
+    except Exception as e:
+        frappe.log_error(f"Error generating thermal labels: {str(e)}", "Barcode Generator")
+        return None
+
+def get_serials_for_batch_print(serial_nos=None, item_code=None, from_date=None, to_date=None,
+                                status=None, purchase_document_no=None):
+    """
+    Fetch the Tenacity Serial No rows for a batch print with one query, either by name or by
+    filters (item, creation date range, status, receipt). Rows come back in the order given,
+    or in creation order for filters.
+    """
+    meta = frappe.get_meta("Tenacity Serial No")
+    fields = ["name", "serial_no", "item_code"]
+    for fieldname in ("custom_barcode_symbology", "company"):
+        if meta.has_field(fieldname):
+            fields.append(fieldname)
+
+    filters = {}
+    if serial_nos:
+        filters["name"] = ["in", list(serial_nos)]
+    if item_code:
+        filters["item_code"] = item_code
+    if purchase_document_no:
+        filters["purchase_document_no"] = purchase_document_no
+    if status:
+        if not meta.has_field("status"):
+            frappe.throw("Tenacity Serial No has no status field, so labels cannot be filtered by status")
+        filters["status"] = status
+    if from_date and to_date:
+        filters["creation"] = ["between", [from_date, to_date]]
+    elif from_date:
+        filters["creation"] = [">=", from_date]
+    elif to_date:
+        filters["creation"] = ["<=", to_date]
 
-        # Add serial number
-        pdf.set_xy(margin_x + 5, start_y)
-        pdf.set_font("Arial", size=8)
-        pdf.cell(0, 5, f"S/N: {serial_no}")
+    if not filters:
+        frappe.throw("Give serial numbers or at least one filter to print labels for")
 
-        # Add item code
-        pdf.set_xy(margin_x + 5, start_y + 7)
-        pdf.set_font("Arial", size=8)
-        pdf.cell(0, 5, f"Item: {serial.item_code}")
+    serials = frappe.get_all(
+        "Tenacity Serial No",
+        filters=filters,
+        fields=fields,
+        order_by="creation asc, name asc",
+        limit_page_length=MAX_BATCH_LABELS + 1
+    )
+    if len(serials) > MAX_BATCH_LABELS:
+        frappe.throw(
+            f"These filters match more than {MAX_BATCH_LABELS:,} serials, and a batch print takes at most "
+            f"{MAX_BATCH_LABELS:,}. Narrow them, for example with a shorter date range, and print in parts."
+        )
+
+    if serial_nos:
+        position = {name: idx for idx, name in enumerate(serial_nos)}
+        serials.sort(key=lambda serial: position.get(serial.name, len(position)))
+    return serials
 
-        # Add barcode image
-        barcode_path = frappe.get_site_path('public', barcode_url.lstrip('/'))
-        if os.path.exists(barcode_path):
-            pdf.image(barcode_path, margin_x + 25, start_y + 12, w=50)
+def get_batch_print_key(serials):
+    """
+    Key of a batch print, from its serials in print order, for single_flight and the job queue.
+    Cheap to compute before anything is rendered, unlike the content digest naming the PDF.
+    """
+    digest = hashlib.sha1("\n".join(serial.name for serial in serials).encode()).hexdigest()[:16]
+    return f"batch-{digest}"
 
-        # Save the PDF
-        pdf_folder = frappe.get_site_path('public', 'files', 'barcode_prints')
-        if not os.path.exists(pdf_folder):
-            os.makedirs(pdf_folder)
+def print_barcodes_for_serials(serials, progress=None):
+    """
+    Print labels for any set of Tenacity Serial No rows (see get_serials_for_batch_print)
+    into a single PDF, in one pass: symbologies, item names, logo and barcode images are
+    all resolved in bulk before the first page. Uses the stock entry label and Label Sheet.
+    The file is named after its content hash, so reprinting the same batch reuses it.
+    """
+    if not serials:
+        return None
+
+    settings = get_barcode_settings()
+    draw_qr = QR_DRAWERS.get(settings.qr_drawing)
+    generator = BarcodeGenerator()
+
+    barcodes = [
+        {
+            "serial_no": serial.serial_no or serial.name,
+            "item_code": serial.item_code,
+            "symbology": generator.resolve_symbology(
+                serial.item_code, serial.get("custom_barcode_symbology"), serial.serial_no or serial.name
+            ),
+            "barcode_url": None
+        }
+        for serial in serials
+    ]
+
+    # Stored images are resolved (and missing ones rendered) chunk by chunk; archive and
+    # on-demand modes render through the image cache instead of writing loose files
+    if not draw_qr and not generator.on_demand_images and not generator.archive_images:
+        step = cint(settings.bulk_insert_chunk_size) or 500
+        for offset in range(0, len(barcodes), step):
+            chunk = barcodes[offset:offset + step]
+            urls = generator.save_or_get_barcode_images([(barcode['serial_no'], barcode['symbology']) for barcode in chunk])
+            for barcode, url in zip(chunk, urls, strict=True):
+                barcode['barcode_url'] = url
+        frappe.db.commit()
 
-        file_path = os.path.join(pdf_folder, f"{serial_no}_barcode.pdf")
-        pdf.output(file_path)
+    companies = {serial.get("company") for serial in serials}
+    context = get_label_render_context(barcodes, companies.pop() if len(companies) == 1 else None)
+    plan = compile_label_template("Stock Entry", bool(context.logo))
+    sheet = get_label_sheet(settings.label_sheet, "Stock Entry")
+    slots = iter_label_slots(sheet, "Stock Entry")
+
+    digest = hashlib.sha1("".join(
+        [get_label_layout_digest("Stock Entry", settings, generator, context)]
+        + [get_label_digest(barcode, context) for barcode in barcodes]
+    ).encode()).hexdigest()[:16]
+    file_name = f"batch-{digest}_barcodes.pdf"
+    file_url = f"/files/barcode_prints/{file_name}"
+    file_path = frappe.get_site_path('public', 'files', 'barcode_prints', file_name)
+    if os.path.exists(file_path):
+        return file_url
+
+    with StreamingLabelPDF(file_path, sheet.page_width, sheet.page_height) as pdf:
+        for label_no, barcode in enumerate(barcodes, start=1):
+            new_page, transform = next(slots)
+            if new_page:
+                pdf.add_page()
+
+            barcode_png = None
+            if not draw_qr:
+                barcode_png = generator.load_barcode_png(barcode['serial_no'], barcode['symbology'], barcode['barcode_url'])
+
+            render_label(pdf, generator, plan, barcode, context, draw_qr, barcode_png, transform)
+
+            if progress and (label_no % 50 == 0 or label_no == len(barcodes)):
+                progress("pages", label_no, len(barcodes))
+
+    frappe.get_doc({
+        "doctype": "File",
+        "file_name": file_name,
+        "file_url": file_url,
+        "is_private": 0
+    }).insert(ignore_permissions=True)
+
+    frappe.log_error(f"Generated batch barcode PDF with {len(barcodes)} labels: {file_url}", "Barcode Generator")
+    return file_url
+
+def resolve_png_sources(generator, barcodes):
+    """
+    Record where each barcode's stored PNG lives (file or archive member) as
+    barcode['png_source'], and its image cache parameters, while the site is still
+    available to resolve paths and settings
+    """
+    for barcode in barcodes:
+        url = barcode.get('barcode_url') or ""
+        source = None
+        if url.startswith(ARCHIVE_URL_PREFIX):
+            source = ("archive", *split_archive_member_url(url))
+        elif url.startswith(BARCODE_URL_PREFIX):
+            path = resolve_barcode_path(url)
+            source = ("file", path) if path else None
+        barcode['png_source'] = source
+        barcode['cache_params'] = generator.get_cache_params(barcode.get('symbology'))
+
+def find_stored_barcode_urls(generator, barcodes, archive_name=None):
+    """
+    Fill in barcode['barcode_url'] for images that are already stored, without writing any.
+    Archive mode looks in the receipt's archive, otherwise one File query covers the batch.
+    """
+    if generator.archive_images and archive_name:
+        index = BarcodeArchive(get_barcode_file_path(get_archive_url(archive_name))).get_index()
+        for barcode in barcodes:
+            member = generator.get_barcode_file_name(barcode['serial_no'], barcode.get('symbology'))
+            barcode['barcode_url'] = get_archive_member_url(archive_name, member) if member in index else None
+        return
+
+    urls = generator.get_existing_barcode_urls([(barcode['serial_no'], barcode.get('symbology')) for barcode in barcodes])
+    for barcode, url in zip(barcodes, urls, strict=True):
+        barcode['barcode_url'] = url
+
+def read_png_source(generator, barcode, image_cache=None):
+    """
+    Read a barcode's PNG from its resolved source, or render it if it has none. Rendered
+    images go through the in-process tier of `image_cache` only. Does not use frappe.
+    """
+    source = barcode.get('png_source')
+    try:
+        if source and source[0] == "archive":
+            png = BarcodeArchive(source[1]).read(source[2])
+            if png:
+                return png
+        elif source:
+            with open(source[1], "rb") as f:
+                return f.read()
+
+        def render():
+            return generator.render_barcode_png(barcode['serial_no'], barcode.get('symbology'))
+
+        if image_cache is None:
+            return render()
+        return image_cache.get_or_render(
+            barcode['serial_no'], barcode.get('symbology') or generator.default_symbology,
+            barcode['cache_params'], render, local_only=True
+        )
+    except Exception as e:
+        logger.error(f"Barcode generation error for {barcode['serial_no']}: {str(e)}")
+        return None
+
+def stream_label_pdf(generator, barcodes, template, sheet, context, draw_qr=None, chunk_size=64 * 1024,
+                     image_cache=None):
+    """
+    Yield a label PDF as byte chunks while its pages are drawn, for streaming straight into an
+    HTTP response without writing a file. The body is iterated after the request has been torn
+    down, so everything that needs the site or database must already be resolved:
+    the render context, and the PNG sources (resolve_png_sources) unless drawing vectors.
+    """
+    plan = compile_label_template(template, bool(context.logo))
+    slots = iter_label_slots(sheet, template)
+    buffer = BytesIO()
+    pdf = StreamingLabelPDF(buffer, sheet.page_width, sheet.page_height)
+    pdf.open()
+
+    for barcode in barcodes:
+        new_page, transform = next(slots)
+        if new_page:
+            pdf.add_page()
+
+        barcode_png = None if draw_qr else read_png_source(generator, barcode, image_cache)
+        render_label(pdf, generator, plan, barcode, context, draw_qr, barcode_png, transform)
+
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    pdf.close()
+    yield buffer.getvalue()
+
+def stream_barcodes_for_stock_entry(stock_entry_name, barcodes):
+    """
+    Return the label PDF of a stock entry as a chunk iterator, for direct download.
+    `barcodes` are the entries from generate_barcodes_for_stock_entry(render_images=False).
+    Nothing is saved: stored images are used where they exist and the rest are rendered
+    while streaming, without writing image files, a PDF, a manifest or File documents.
+    """
+    settings = get_barcode_settings()
+    draw_qr = QR_DRAWERS.get(settings.qr_drawing)
+    generator = BarcodeGenerator()
+
+    company = frappe.get_value("Purchase Receipt", stock_entry_name, "company")
+    context = get_label_render_context(barcodes, company)
+    image_cache = None
+    if not draw_qr:
+        if not generator.on_demand_images:
+            find_stored_barcode_urls(generator, barcodes, stock_entry_name)
+        resolve_png_sources(generator, barcodes)
+        image_cache = get_image_cache()
+
+    sheet = get_label_sheet(settings.label_sheet, "Stock Entry")
+    return stream_label_pdf(generator, barcodes, "Stock Entry", sheet, context, draw_qr, image_cache=image_cache)
+
+def stream_barcode_for_serial_no(serial_no):
+    """Return the single-serial A4 label PDF as a chunk iterator, for direct download"""
+    serial = frappe.get_doc("Tenacity Serial No", serial_no)
+    generator = BarcodeGenerator()
+    draw_qr = QR_DRAWERS.get(get_barcode_settings().qr_drawing)
+    symbology = generator.resolve_symbology(serial.item_code, serial.get("custom_barcode_symbology"), serial_no)
+
+    # Stored images are used when there is one; otherwise the barcode is rendered while streaming
+    barcode = {"serial_no": serial_no, "item_code": serial.item_code, "symbology": symbology, "barcode_url": None}
+    image_cache = None
+    if not draw_qr:
+        if not generator.on_demand_images:
+            find_stored_barcode_urls(generator, [barcode], serial.get("purchase_document_no"))
+        resolve_png_sources(generator, [barcode])
+        image_cache = get_image_cache()
+
+    company = frappe.get_value("Tenacity Serial No", serial_no, "company")
+    context = get_label_render_context([barcode], company)
+    return stream_label_pdf(
+        generator, [barcode], "Serial No", SERIAL_LABEL_SHEET, context, draw_qr, image_cache=image_cache
+    )
+
+def print_barcode_for_serial_no(serial_no):
+    """Generate a PDF with a single barcode for a serial number"""
+    try:
+        # Get the serial number details
+        serial = frappe.get_doc("Tenacity Serial No", serial_no)
+        generator = BarcodeGenerator()
+        draw_qr = QR_DRAWERS.get(get_barcode_settings().qr_drawing)
+        symbology = generator.resolve_symbology(serial.item_code, serial.get("custom_barcode_symbology"), serial_no)
+
+        # Generate or get existing barcode
+        barcode_url = None
+        if not draw_qr:
+            barcode_url = generator.save_or_get_barcode_image(serial_no, symbology)
+            if not barcode_url:
+                return None
+
+        # Get company logo for branding
+        company = frappe.get_value("Tenacity Serial No", serial_no, "company")
+        barcode = {"serial_no": serial_no, "item_code": serial.item_code, "symbology": symbology}
+        context = get_label_render_context([barcode], company)
+
+        barcode_png = None
+        if not draw_qr:
+            barcode_png = generator.load_barcode_png(serial_no, symbology, barcode_url)
+
+        plan = compile_label_template("Serial No", bool(context.logo))
+        sheet = SERIAL_LABEL_SHEET
+        _, transform = next(iter_label_slots(sheet, "Serial No"))
+
+        file_path = frappe.get_site_path('public', 'files', 'barcode_prints', f"{serial_no}_barcode.pdf")
+        with StreamingLabelPDF(file_path, sheet.page_width, sheet.page_height) as pdf:
+            pdf.add_page()
+            render_label(pdf, generator, plan, barcode, context, draw_qr, barcode_png, transform)
 
         # Create File document
         file_url = f"/files/barcode_prints/{serial_no}_barcode.pdf"
@@ -428,7 +1388,106 @@ def print_barcode_for_serial_no(serial_no):
 
         return file_url
 
+    except BarcodeSymbologyError:
+        frappe.db.rollback()
+        raise
+
     except Exception as e:
         frappe.log_error(f"Error printing barcode: {str(e)}", "Barcode Generator")
         return None
     
+
+def in_background_job():
+    """True inside a background worker job, where forking a render pool cannot disturb a request"""
+    return bool(frappe.flags.in_job or getattr(frappe.local, "job", None))
+
+def get_barcode_job_id(stock_entry_name):
+    return f"barcode_generation::{stock_entry_name}"
+
+def get_barcode_job_progress(stock_entry_name):
+    """Return the last progress update published for a stock entry's barcode job"""
+    return frappe.cache().hget("barcode_job_progress", stock_entry_name)
+
+def publish_barcode_job_progress(stock_entry_name, user, stage, done=0, total=0, **extra):
+    """Store the job's progress and push it to the user who queued it"""
+    data = {
+        "stock_entry_name": stock_entry_name,
+        "stage": stage,
+        "done": done,
+        "total": total,
+        **extra
+    }
+    frappe.cache().hset("barcode_job_progress", stock_entry_name, data)
+    frappe.publish_realtime("barcode_job_progress", data, user=user)
+
+def enqueue_barcode_job(stock_entry_name, print_labels=True, serial_nos=None):
+    """
+    Queue barcode generation (and optionally the label PDF) for a stock entry on the long queue.
+    With `serial_nos` the job prints those serials as one batch instead, and `stock_entry_name`
+    is the batch's key (get_batch_print_key).
+    Queuing again while a job for the same stock entry or batch is pending does nothing.
+    """
+    job_id = get_barcode_job_id(stock_entry_name)
+    publish_barcode_job_progress(stock_entry_name, frappe.session.user, "queued")
+    frappe.enqueue(
+        "barcode_generator.utils.barcode_generator.run_barcode_job",
+        queue="long",
+        timeout=3600,
+        job_id=job_id,
+        deduplicate=True,
+        stock_entry_name=stock_entry_name,
+        print_labels=print_labels,
+        serial_nos=serial_nos,
+        user=frappe.session.user
+    )
+    return job_id
+
+def run_barcode_job(stock_entry_name, print_labels=True, user=None, serial_nos=None):
+    """
+    Background job body. Serials and images are committed chunk by chunk, so a failed
+    or killed job can simply be queued again and continues from the last committed serial.
+    """
+    settings = get_barcode_settings()
+    chunk_size = cint(settings.job_chunk_size) or 500
+
+    def progress(stage, done, total):
+        publish_barcode_job_progress(stock_entry_name, user, stage, done, total)
+
+    # Shares the per-receipt lock with the API, so a job and a request never mint side by side
+    from barcode_generator.utils.api import SINGLE_FLIGHT_LOCK_TTL, single_flight
+
+    try:
+        if serial_nos:
+            result = single_flight(
+                stock_entry_name, "print",
+                lambda: print_barcodes_for_serials(get_serials_for_batch_print(serial_nos=serial_nos), progress=progress),
+                wait=SINGLE_FLIGHT_LOCK_TTL
+            )
+        elif print_labels:
+            result = single_flight(
+                stock_entry_name, "print",
+                lambda: print_barcodes_for_stock_entry(stock_entry_name, chunk_size=chunk_size, progress=progress),
+                wait=SINGLE_FLIGHT_LOCK_TTL
+            )
+        else:
+            result = single_flight(
+                stock_entry_name, "generate",
+                lambda: generate_barcodes_for_stock_entry(stock_entry_name, chunk_size=chunk_size, progress=progress),
+                wait=SINGLE_FLIGHT_LOCK_TTL
+            )
+        frappe.db.commit()
+
+        if result:
+            publish_barcode_job_progress(stock_entry_name, user, "done", result=result)
+        else:
+            publish_barcode_job_progress(stock_entry_name, user, "failed")
+        return result
+
+    except BarcodeSymbologyError as e:
+        frappe.db.rollback()
+        publish_barcode_job_progress(stock_entry_name, user, "failed", error=str(e))
+
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(f"Barcode job failed for {stock_entry_name}: {str(e)}", "Barcode Generator")
+        publish_barcode_job_progress(stock_entry_name, user, "failed")
@@ -0,0 +1,235 @@
+import fcntl
+import hashlib
+import os
+import re
+import struct
+import zipfile
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import cint
+
+BARCODE_URL_PREFIX = "/files/barcodes/"
+# {serial_no}.png or {serial_no}-{symbology}.png: a single path component, never hidden
+BARCODE_FILE_NAME = re.compile(r"[^./\\\x00][^/\\\x00]*\.png")
+
+logger = frappe.logger("barcode_generator")
+
+
+def get_shard(file_name):
+    """Two-level hash prefix (e.g. "3f/a2") spreading barcode files over 65,536 directories"""
+    digest = hashlib.md5(file_name.encode()).hexdigest()
+    return f"{digest[:2]}/{digest[2:4]}"
+
+def get_barcode_file_url(file_name, sharded=None):
+    """Return the public URL a barcode image with this file name is stored under"""
+    if sharded is None:
+        sharded = frappe.get_cached_doc("Barcode Generator Settings").sharded_storage
+    if sharded:
+        return f"{BARCODE_URL_PREFIX}{get_shard(file_name)}/{file_name}"
+    return f"{BARCODE_URL_PREFIX}{file_name}"
+
+def is_barcode_file_name(file_name):
+    """True for a bare barcode image file name, i.e. one that cannot step outside its directory"""
+    return bool(file_name) and os.path.basename(file_name) == file_name and bool(BARCODE_FILE_NAME.fullmatch(file_name))
+
+def get_barcode_file_path(file_url):
+    return frappe.get_site_path("public", file_url.lstrip("/"))
+
+def resolve_barcode_url(file_url):
+    """
+    Return the URL where a barcode image actually lives now. Flat URLs written before the
+    sharded migration resolve to their shard, and sharded URLs fall back to the flat file
+    while the migration is still moving files. Returns None when neither exists.
+    """
+    if not file_url or not file_url.startswith(BARCODE_URL_PREFIX):
+        return file_url
+
+    file_name = file_url.rsplit("/", 1)[-1]
+    for candidate in (file_url, get_barcode_file_url(file_name, True), get_barcode_file_url(file_name, False)):
+        if os.path.exists(get_barcode_file_path(candidate)):
+            return candidate
+    return None
+
+def resolve_barcode_path(file_url):
+    """Filesystem path of the barcode image behind a (possibly pre-migration) URL"""
+    resolved = resolve_barcode_url(file_url)
+    return get_barcode_file_path(resolved) if resolved else None
+
+def write_barcode_file(file_url, content):
+    path = get_barcode_file_path(file_url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+def migrate_barcodes_to_sharded_layout(batch_size=1000):
+    """
+    Move flat public/files/barcodes/*.png files into hash-prefixed subdirectories and rewrite
+    File.file_url and Tenacity Serial No.custom_barcode_image in bulk.
+    Safe to re-run: files already in a shard are left alone and every flat URL still in the
+    database is rewritten, whichever step an interrupted run stopped at.
+    Run with bench execute, then enable Sharded Storage in Barcode Generator Settings.
+    """
+    batch_size = cint(batch_size) or 1000
+    barcode_folder = frappe.get_site_path("public", "files", "barcodes")
+    moved = 0
+
+    # Move files first; the resolver keeps old URLs working until the database catches up
+    if os.path.isdir(barcode_folder):
+        with os.scandir(barcode_folder) as entries:
+            for entry in entries:
+                if not entry.is_file() or not entry.name.endswith(".png"):
+                    continue
+                target = get_barcode_file_path(get_barcode_file_url(entry.name, True))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(entry.path, target)
+                moved += 1
+
+    updated = _rewrite_flat_urls("File", "file_url", batch_size)
+    if frappe.db.has_column("Tenacity Serial No", "custom_barcode_image"):
+        updated += _rewrite_flat_urls("Tenacity Serial No", "custom_barcode_image", batch_size)
+
+    logger.info(f"Sharded barcode layout: moved {moved} files, rewrote {updated} URLs")
+    return {"moved": moved, "updated": updated}
+
+def _rewrite_flat_urls(doctype, fieldname, batch_size):
+    """Point every flat /files/barcodes/<name> URL in doctype.fieldname at its shard, in bulk"""
+    updated = 0
+    while True:
+        flat_urls = frappe.db.sql_list(
+            f"""
+            SELECT DISTINCT `{fieldname}` FROM `tab{doctype}`
+            WHERE `{fieldname}` LIKE %s AND `{fieldname}` NOT LIKE %s
+            LIMIT %s
+            """,
+            (f"{BARCODE_URL_PREFIX}%", f"{BARCODE_URL_PREFIX}%/%", batch_size)
+        )
+        if not flat_urls:
+            return updated
+
+        mapping = [(url, get_barcode_file_url(url.rsplit("/", 1)[-1], True)) for url in flat_urls]
+        cases = " ".join(["WHEN %s THEN %s"] * len(mapping))
+        params = [value for pair in mapping for value in pair] + flat_urls
+        frappe.db.sql(
+            f"""
+            UPDATE `tab{doctype}`
+            SET `{fieldname}` = CASE `{fieldname}` {cases} END
+            WHERE `{fieldname}` IN ({", ".join(["%s"] * len(flat_urls))})
+            """,
+            params
+        )
+        frappe.db.commit()
+        updated += len(flat_urls)
+
+
+ARCHIVE_URL_PREFIX = "/files/barcode_archives/"
+_archive_indexes = {}
+
+def get_archive_url(archive_name):
+    return f"{ARCHIVE_URL_PREFIX}{archive_name}.zip"
+
+def get_archive_member_url(archive_name, member):
+    """URL addressing one image inside a receipt archive, e.g. /files/barcode_archives/PR-0001.zip#x.png"""
+    return f"{get_archive_url(archive_name)}#{member}"
+
+def split_archive_member_url(url):
+    """Return (archive path, member name) for an archive member URL"""
+    archive_url, member = url.split("#", 1)
+    return get_barcode_file_path(archive_url), member
+
+
+class BarcodeArchive:
+    """
+    All barcode images of one Purchase Receipt in a single uncompressed zip file.
+    PNGs are already deflated, so members are STORED, which lets a member be read by
+    seeking straight to its data. The offset table is derived from the zip central
+    directory once per archive version and kept in memory.
+    Appends take an exclusive lock on a sidecar .lock file and index builds a shared one,
+    so a single-serial print and a receipt run never write the zip at the same time.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def get_index(self):
+        """Return {member: (data_offset, size)}, in archive order"""
+        if not self.exists():
+            return {}
+
+        # Fast path without the lock: a cached (mtime, size) version is always a complete one
+        stat = os.stat(self.path)
+        cached = _archive_indexes.get((self.path, stat.st_mtime_ns, stat.st_size))
+        if cached is not None:
+            return cached
+
+        with self._lock(fcntl.LOCK_SH):
+            return self._read_index_unlocked()
+
+    def _read_index_unlocked(self):
+        if not self.exists():
+            return {}
+
+        stat = os.stat(self.path)
+        cache_key = (self.path, stat.st_mtime_ns, stat.st_size)
+        if cache_key in _archive_indexes:
+            return _archive_indexes[cache_key]
+
+        index = {}
+        with zipfile.ZipFile(self.path) as archive, open(self.path, "rb") as f:
+            for info in sorted(archive.infolist(), key=lambda info: info.header_offset):
+                # The local header's name and extra lengths can differ from the central directory's
+                f.seek(info.header_offset + 26)
+                name_length, extra_length = struct.unpack("<HH", f.read(4))
+                index[info.filename] = (info.header_offset + 30 + name_length + extra_length, info.file_size)
+
+        # Keep only the latest version of each archive
+        for key in [key for key in _archive_indexes if key[0] == self.path]:
+            del _archive_indexes[key]
+        _archive_indexes[cache_key] = index
+        return index
+
+    def read(self, member):
+        """Read one image by seeking to its offset, without touching the rest of the archive"""
+        location = self.get_index().get(member)
+        if not location:
+            return None
+        offset, size = location
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return f.read(size)
+
+    def iter_members(self):
+        """Yield (member, bytes) for every image in archive order, in one sequential pass"""
+        index = self.get_index()
+        with open(self.path, "rb") as f:
+            for member, (offset, size) in index.items():
+                f.seek(offset)
+                yield member, f.read(size)
+
+    def append(self, members):
+        """Add (member, bytes) pairs that are not in the archive yet"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock(fcntl.LOCK_EX):
+            # Read the index under the lock, so members another writer just added are skipped
+            existing = self._read_index_unlocked()
+            members = [(name, content) for name, content in members if name not in existing]
+            if not members:
+                return 0
+
+            with zipfile.ZipFile(self.path, "a" if self.exists() else "w", compression=zipfile.ZIP_STORED) as archive:
+                for name, content in members:
+                    archive.writestr(name, content)
+        return len(members)
+
+    @contextmanager
+    def _lock(self, operation):
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,119 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import frappe
+from frappe.utils import cint
+
+
+class BarcodeImageCache:
+    """
+    Content-addressed cache for rendered barcode images.
+    Keys are derived from (payload, symbology, size parameters), so any worker that renders
+    the same barcode produces the same key. The first tier is an in-process LRU capped
+    by total bytes; the optional second tier is the site's Redis cache with a TTL,
+    shared by every worker on the site.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, use_redis=False, redis_ttl=86400):
+        self.max_bytes = max_bytes
+        self.use_redis = use_redis
+        self.redis_ttl = redis_ttl
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "redis_hits": 0,
+            "redis_misses": 0,
+        }
+
+    @staticmethod
+    def make_key(payload, symbology, params=()):
+        raw = "\x1f".join([payload, symbology, *map(str, params)])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key, local_only=False):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return data
+            self.stats["misses"] += 1
+
+        if not self.use_redis or local_only:
+            return None
+
+        data = frappe.cache().get_value(f"barcode_image:{key}")
+        if data is None:
+            self.stats["redis_misses"] += 1
+            return None
+
+        self.stats["redis_hits"] += 1
+        self._put_local(key, data)
+        return data
+
+    def set(self, key, data, local_only=False):
+        self._put_local(key, data)
+        if self.use_redis and not local_only:
+            frappe.cache().set_value(f"barcode_image:{key}", data, expires_in_sec=self.redis_ttl)
+
+    def get_or_render(self, payload, symbology, params, render, local_only=False):
+        """
+        Return cached bytes for a barcode, calling `render()` only on a miss in every tier.
+        `local_only` skips Redis, for callers running outside a request (e.g. streamed bodies).
+        """
+        key = self.make_key(payload, symbology, params)
+        data = self.get(key, local_only=local_only)
+        if data is None:
+            data = render()
+            if data:
+                self.set(key, data, local_only=local_only)
+        return data
+
+    def _put_local(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            self._entries[key] = data
+            self._size += len(data)
+
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def get_stats(self):
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries), "bytes": self._size, "max_bytes": self.max_bytes}
+
+
+_cache = None
+
+def get_image_cache():
+    """Return this process's barcode image cache, built from Barcode Generator Settings on first use"""
+    global _cache
+    if _cache is None:
+        settings = frappe.get_cached_doc("Barcode Generator Settings")
+        _cache = BarcodeImageCache(
+            max_bytes=(cint(settings.image_cache_size_mb) or 64) * 1024 * 1024,
+            use_redis=bool(settings.use_redis_image_cache),
+            redis_ttl=cint(settings.redis_image_cache_ttl) or 86400,
+        )
+    return _cache
+
+def reset_image_cache():
+    """Drop this process's cache so it is rebuilt with the current settings"""
+    global _cache
+    _cache = None
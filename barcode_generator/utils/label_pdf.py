@@ -0,0 +1,435 @@
+import hashlib
+import os
+import struct
+import zlib
+from io import BytesIO
+
+from PIL import Image
+
+# Core font names for the family/style pairs used on labels ("Arial" is Helvetica, as in FPDF)
+CORE_FONTS = {
+    ("helvetica", ""): "Helvetica",
+    ("helvetica", "B"): "Helvetica-Bold",
+    ("helvetica", "I"): "Helvetica-Oblique",
+    ("helvetica", "BI"): "Helvetica-BoldOblique",
+    ("times", ""): "Times-Roman",
+    ("times", "B"): "Times-Bold",
+    ("times", "I"): "Times-Italic",
+    ("times", "BI"): "Times-BoldItalic",
+    ("courier", ""): "Courier",
+    ("courier", "B"): "Courier-Bold",
+    ("courier", "I"): "Courier-Oblique",
+    ("courier", "BI"): "Courier-BoldOblique",
+}
+
+# Object numbers reserved for the objects written last
+CATALOG_OBJ = 1
+PAGES_OBJ = 2
+
+
+class StreamingLabelPDF:
+    """
+    PDF writer that streams pages to a file as they are finished, for label runs too large
+    to hold as one FPDF document. Fonts and path images (the company logo) are written once
+    and shared by every page; per-label images and content streams are written and dropped
+    at the end of their page, so memory stays flat however many labels are printed.
+
+    It mirrors the subset of the FPDF API the label code uses (add_page, set_xy, set_font,
+    cell, multi_cell, image, rect, set_fill_color, plus k, h and _out for the vector drawers) with
+    FPDF's geometry, so pages come out laid out exactly as before.
+    Use it as a context manager: the file only appears under `path` once it is complete.
+    `path` may also be a writable file object, e.g. a buffer drained into an HTTP response.
+
+    After closing, get_state() describes the finished file. Passing that state back as
+    `resume` appends further pages to the same file as a PDF incremental update: only the
+    new pages, a new page tree and an xref section for them are written, and the fonts and
+    logo already in the file are reused.
+    """
+
+    def __init__(self, path, width, height, compress=True, resume=None):
+        # Geometry in mm, like FPDF(unit="mm"); k converts to points
+        self.path = path
+        self.k = 72 / 25.4
+        self.w = width
+        self.h = height
+        self.compress = compress
+        # FPDF's default cell margin (1/10 of the 1cm page margin)
+        self.c_margin = 1
+        self.x = 0
+        self.y = 0
+
+        self._file = None
+        self._offset = 0
+        self._offsets = {}
+        self._next_obj = PAGES_OBJ + 1
+        self._page_objs = []
+        self._page = None
+        self._fonts = {}
+        self._images = {}
+        self._font_key = None
+        self._font_size_pt = 12
+        self._line_splitter = None
+        self._image_keys = {}
+        self._resume = resume
+        self._xref_offset = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type:
+            self.abort()
+        else:
+            self.close()
+
+    @property
+    def font_size(self):
+        return self._font_size_pt / self.k
+
+    def open(self):
+        if self._resume:
+            self._open_for_append()
+            return
+
+        if not isinstance(self.path, str):
+            self._file = self.path
+            self._write(b"%PDF-1.4\n%\xe9\xeb\xf1\xbf\n")
+            return
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(f"{self.path}.part", "wb")
+        self._write(b"%PDF-1.4\n%\xe9\xeb\xf1\xbf\n")
+
+    def _open_for_append(self):
+        state = self._resume
+        self._file = open(self.path, "ab")
+        self._offset = self._resume_offset = os.path.getsize(self.path)
+        self._next_obj = state["size"]
+        self._page_objs = list(state["pages"])
+        self._fonts = {tuple(key.split("|")): tuple(value) for key, value in state["fonts"].items()}
+        self._images = {key: (None, dict(info)) for key, info in state["images"].items()}
+
+    def get_state(self):
+        """What a later StreamingLabelPDF needs to append pages to the file written by this one"""
+        return {
+            "xref": self._xref_offset,
+            "size": self._next_obj,
+            "pages": self._page_objs,
+            "fonts": {"|".join(key): list(value) for key, value in self._fonts.items()},
+            "images": {key: info for key, (_, info) in self._images.items()},
+        }
+
+    def close(self):
+        """Finish the current page, write the page tree, catalog and xref, and publish the file"""
+        self._end_page()
+
+        kids = " ".join(f"{obj} 0 R" for obj in self._page_objs)
+        self._write_obj(
+            f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_objs)} "
+            f"/MediaBox [0 0 {self.w * self.k:.2f} {self.h * self.k:.2f}] >>",
+            obj=PAGES_OBJ
+        )
+        if self._resume:
+            self._close_append()
+            return
+
+        self._write_obj(f"<< /Type /Catalog /Pages {PAGES_OBJ} 0 R >>", obj=CATALOG_OBJ)
+
+        self._xref_offset = self._offset
+        size = self._next_obj
+        xref = [f"xref\n0 {size}\n0000000000 65535 f \n"]
+        xref.extend(f"{self._offsets.get(obj, 0):010d} 00000 n \n" for obj in range(1, size))
+        xref.append(f"trailer\n<< /Size {size} /Root {CATALOG_OBJ} 0 R >>\nstartxref\n{self._xref_offset}\n%%EOF\n")
+        self._write("".join(xref).encode())
+
+        if isinstance(self.path, str):
+            self._file.close()
+            os.replace(f"{self.path}.part", self.path)
+
+    def _close_append(self):
+        # The catalog still points at the page tree object, which was just superseded
+        first_new = self._resume["size"]
+        size = self._next_obj
+        self._xref_offset = self._offset
+        xref = ["xref\n", f"{PAGES_OBJ} 1\n{self._offsets[PAGES_OBJ]:010d} 00000 n \n", f"{first_new} {size - first_new}\n"]
+        xref.extend(f"{self._offsets.get(obj, 0):010d} 00000 n \n" for obj in range(first_new, size))
+        xref.append(
+            f"trailer\n<< /Size {size} /Root {CATALOG_OBJ} 0 R /Prev {self._resume['xref']} >>\n"
+            f"startxref\n{self._xref_offset}\n%%EOF\n"
+        )
+        self._write("".join(xref).encode())
+        self._file.close()
+
+    def abort(self):
+        """Drop a half-written document, or the half-written update of an appended one"""
+        if not self._file or not isinstance(self.path, str):
+            return
+        self._file.close()
+        if self._resume:
+            os.truncate(self.path, self._resume_offset)
+        elif os.path.exists(f"{self.path}.part"):
+            os.remove(f"{self.path}.part")
+
+    def add_page(self):
+        self._end_page()
+        self._page = {"ops": ["2 J", "0.57 w"], "fonts": set(), "images": set()}
+        self.x = self.y = 10
+        if self._font_key:
+            self._page["ops"].append(f"BT /F{self._fonts[self._font_key][0]} {self._font_size_pt:.2f} Tf ET")
+            self._page["fonts"].add(self._font_key)
+
+    def set_xy(self, x, y):
+        self.x = x
+        self.y = y
+
+    def set_font(self, family, style="", size=12):
+        family = family.lower()
+        if family == "arial":
+            family = "helvetica"
+        key = (family, "".join(sorted(style.upper().replace("U", ""))))
+        if key not in CORE_FONTS:
+            raise ValueError(f"Unsupported label font: {family} {style}")
+
+        if key not in self._fonts:
+            obj = self._write_obj(
+                f"<< /Type /Font /Subtype /Type1 /BaseFont /{CORE_FONTS[key]} /Encoding /WinAnsiEncoding >>"
+            )
+            self._fonts[key] = (len(self._fonts) + 1, obj)
+
+        self._font_key = key
+        self._font_size_pt = size
+        self._get_line_splitter().set_font(family, key[1], size)
+        if self._page is not None:
+            self._page["ops"].append(f"BT /F{self._fonts[key][0]} {size:.2f} Tf ET")
+            self._page["fonts"].add(key)
+
+    def multi_cell(self, w, h, txt="", align="L"):
+        """Left-aligned text wrapped to `w`, one line every `h` from the current position"""
+        lines = self._get_line_splitter().multi_cell(w=w, h=h, text=txt, align=align, dry_run=True, output="LINES")
+        for line in lines:
+            # Baseline placement as FPDF: vertically centred in the line, 0.3 font size below the middle
+            baseline = self.y + 0.5 * h + 0.3 * self.font_size
+            self._page["ops"].append(
+                f"BT {(self.x + self.c_margin) * self.k:.2f} {(self.h - baseline) * self.k:.2f} Td "
+                f"({escape_text(line)}) Tj ET"
+            )
+            self.y += h
+
+    def cell(self, w, h, txt=""):
+        """One line of left-aligned text in a w x h cell at the current position; x moves past it"""
+        baseline = self.y + 0.5 * h + 0.3 * self.font_size
+        self._page["ops"].append(
+            f"BT {(self.x + self.c_margin) * self.k:.2f} {(self.h - baseline) * self.k:.2f} Td "
+            f"({escape_text(txt)}) Tj ET"
+        )
+        self.x += w
+
+    def set_fill_color(self, r, g=None, b=None):
+        if g is None or (r == g == b):
+            self._page["ops"].append(f"{r / 255:.3f} g")
+        else:
+            self._page["ops"].append(f"{r / 255:.3f} {g / 255:.3f} {b / 255:.3f} rg")
+
+    def rect(self, x, y, w, h, style=None):
+        operator = {"F": "f", "FD": "B", "DF": "B"}.get(style, "S")
+        self._page["ops"].append(
+            f"{x * self.k:.2f} {(self.h - y) * self.k:.2f} {w * self.k:.2f} {-h * self.k:.2f} re {operator}"
+        )
+
+    def _out(self, content):
+        self._page["ops"].append(content)
+
+    def image(self, source, x, y, w=0, h=0):
+        """
+        Place an image given as a file path, a PIL image, bytes or a file-like object.
+        Paths and PIL images are written once and reused on every page; anything else is
+        written for this page only. Missing dimensions follow the image's aspect ratio, as in FPDF.
+        """
+        if isinstance(source, (str, Image.Image)):
+            key = self._get_image_key(source)
+            if key not in self._images:
+                self._images[key] = (source, self._write_image(source))
+            image = self._images[key][1]
+        else:
+            image = self._write_image(source)
+
+        if not w and not h:
+            w, h = image["w"] / self.k, image["h"] / self.k
+        elif not w:
+            w = h * image["w"] / image["h"]
+        elif not h:
+            h = w * image["h"] / image["w"]
+
+        self._page["images"].add((image["name"], image["obj"]))
+        self._page["ops"].append(
+            f"q {w * self.k:.2f} 0 0 {h * self.k:.2f} {x * self.k:.2f} {(self.h - (y + h)) * self.k:.2f} cm "
+            f"/{image['name']} Do Q"
+        )
+
+    def _get_image_key(self, source):
+        """Stable key for a shared image: its path, or a digest of a PIL image's pixels"""
+        if isinstance(source, str):
+            return f"path:{source}"
+        if id(source) not in self._image_keys:
+            digest = hashlib.sha1(f"{source.mode}{source.size}".encode() + source.tobytes()).hexdigest()
+            # The image stays referenced so its id is not reused within this document
+            self._image_keys[id(source)] = (source, f"image:{digest}")
+        return self._image_keys[id(source)][1]
+
+    def _end_page(self):
+        if self._page is None:
+            return
+
+        content = "\n".join(self._page["ops"]).encode("latin-1")
+        content_obj = self._write_stream(content)
+
+        fonts = " ".join(f"/F{self._fonts[key][0]} {self._fonts[key][1]} 0 R" for key in sorted(self._page["fonts"]))
+        images = " ".join(f"/{name} {obj} 0 R" for name, obj in sorted(self._page["images"]))
+        resources = f"/Font << {fonts} >> /XObject << {images} >>"
+        self._page_objs.append(self._write_obj(
+            f"<< /Type /Page /Parent {PAGES_OBJ} 0 R /Resources << {resources} /ProcSet [/PDF /Text /ImageB /ImageC] >> "
+            f"/Contents {content_obj} 0 R >>"
+        ))
+        self._page = None
+
+    def _write_image(self, source):
+        if isinstance(source, Image.Image):
+            info = image_to_xobject(source)
+        else:
+            if isinstance(source, (bytes, bytearray)):
+                data = bytes(source)
+            elif isinstance(source, str):
+                with open(source, "rb") as f:
+                    data = f.read()
+            else:
+                data = source.read()
+            info = png_passthrough(data) or image_to_xobject(Image.open(BytesIO(data)))
+        smask = info.pop("smask", None)
+        smask_ref = ""
+        if smask is not None:
+            smask_obj = self._write_stream(
+                zlib.compress(smask),
+                f"/Type /XObject /Subtype /Image /Width {info['w']} /Height {info['h']} "
+                f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode",
+                compress=False
+            )
+            smask_ref = f" /SMask {smask_obj} 0 R"
+
+        parms = f" /DecodeParms {info['parms']}" if info.get("parms") else ""
+        obj = self._write_stream(
+            info["data"],
+            f"/Type /XObject /Subtype /Image /Width {info['w']} /Height {info['h']} "
+            f"/ColorSpace /{info['cs']} /BitsPerComponent {info['bpc']} /Filter /{info['filter']}{parms}{smask_ref}",
+            compress=False
+        )
+        return {"name": f"I{obj}", "obj": obj, "w": info["w"], "h": info["h"]}
+
+    def _get_line_splitter(self):
+        # An empty FPDF document is only used to measure and wrap text with FPDF's own rules
+        if self._line_splitter is None:
+            from fpdf import FPDF
+
+            self._line_splitter = FPDF(unit="mm", format=(self.h, self.w) if self.w > self.h else (self.w, self.h))
+            self._line_splitter.add_page()
+        return self._line_splitter
+
+    def _write(self, data):
+        self._file.write(data)
+        self._offset += len(data)
+
+    def _write_obj(self, body, obj=None):
+        if obj is None:
+            obj = self._next_obj
+            self._next_obj += 1
+        self._offsets[obj] = self._offset
+        self._write(f"{obj} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+        return obj
+
+    def _write_stream(self, data, dictionary="", compress=None):
+        if self.compress if compress is None else compress:
+            data = zlib.compress(data)
+            dictionary = f"{dictionary} /Filter /FlateDecode".strip()
+
+        obj = self._next_obj
+        self._next_obj += 1
+        self._offsets[obj] = self._offset
+        self._write(f"{obj} 0 obj\n<< {dictionary} /Length {len(data)} >>\nstream\n".encode("latin-1"))
+        self._write(data)
+        self._write(b"\nendstream\nendobj\n")
+        return obj
+
+
+def escape_text(text):
+    """Encode text for a PDF string in a WinAnsi core font"""
+    text = text.encode("cp1252", "replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").replace("\r", "\\r")
+
+def png_passthrough(data):
+    """
+    Embed a non-interlaced grayscale PNG (the format barcode images are stored in) without
+    decoding it: the IDAT stream is already Flate data with PNG predictors, which PDF can
+    read directly. Returns None for anything else.
+    """
+    if not data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return None
+
+    pos = 8
+    idat = []
+    header = None
+    while pos + 8 <= len(data):
+        length, tag = struct.unpack(">I4s", data[pos:pos + 8])
+        chunk = data[pos + 8:pos + 8 + length]
+        if tag == b"IHDR":
+            header = struct.unpack(">IIBBBBB", chunk)
+        elif tag == b"IDAT":
+            idat.append(chunk)
+        elif tag == b"IEND":
+            break
+        pos += 12 + length
+
+    if not header or not idat:
+        return None
+    width, height, bit_depth, color_type, _, _, interlace = header
+    if color_type != 0 or interlace or bit_depth not in (1, 8):
+        return None
+
+    return {
+        "w": width,
+        "h": height,
+        "cs": "DeviceGray",
+        "bpc": bit_depth,
+        "filter": "FlateDecode",
+        "parms": f"<< /Predictor 15 /Colors 1 /BitsPerComponent {bit_depth} /Columns {width} >>",
+        "data": b"".join(idat),
+    }
+
+def image_to_xobject(image):
+    """Convert a PIL image to raw Flate data, with the alpha channel as a soft mask"""
+    smask = None
+
+    if image.mode == "1":
+        return {
+            "w": image.width, "h": image.height, "cs": "DeviceGray", "bpc": 1,
+            "filter": "FlateDecode", "data": zlib.compress(image.tobytes()),
+        }
+
+    if image.mode in ("P", "PA"):
+        image = image.convert("RGBA")
+    if image.mode in ("RGBA", "LA"):
+        smask = image.getchannel("A").tobytes()
+        image = image.convert("L" if image.mode == "LA" else "RGB")
+    elif image.mode not in ("L", "RGB"):
+        image = image.convert("RGB")
+
+    info = {
+        "w": image.width,
+        "h": image.height,
+        "cs": "DeviceGray" if image.mode == "L" else "DeviceRGB",
+        "bpc": 8,
+        "filter": "FlateDecode",
+        "data": zlib.compress(image.tobytes()),
+    }
+    if smask is not None:
+        info["smask"] = smask
+    return info
@@ -0,0 +1,163 @@
+from functools import cache
+
+# Label layouts, in mm from the label's top-left corner. Elements with a `logo_offset`
+# move down by that much when the label has a logo. Text is a format string over the
+# label fields (serial_no, item_code, item_name); `wrap` text is wrapped to `w`.
+LABEL_TEMPLATES = {
+    "Stock Entry": {
+        "width": 100,
+        "height": 50,
+        "elements": [
+            {"type": "logo", "x": 3, "y": 5, "w": 15},
+            {
+                "type": "text", "text": "{item_name}", "x": 4, "y": 10, "w": 35, "h": 4,
+                "font": ("Arial", "B", 12), "wrap": True, "logo_offset": 15
+            },
+            {"type": "barcode", "x": 43, "y": 5, "w": 40, "h": 40},
+        ],
+    },
+    "Serial No": {
+        "width": 100,
+        "height": 50,
+        "elements": [
+            {"type": "border"},
+            {"type": "logo", "x": 5, "y": 5, "w": 15},
+            {
+                "type": "text", "text": "S/N: {serial_no}", "x": 5, "y": 5, "h": 5,
+                "font": ("Arial", "", 8), "logo_offset": 10
+            },
+            {
+                "type": "text", "text": "Item: {item_code}", "x": 5, "y": 12, "h": 5,
+                "font": ("Arial", "", 8), "logo_offset": 10
+            },
+            {"type": "barcode", "x": 25, "y": 17, "w": 50, "h": 50, "logo_offset": 10},
+        ],
+    },
+}
+
+
+class LabelSheet:
+    """A page holding `columns` x `rows` labels of cell_width x cell_height, in mm"""
+
+    def __init__(self, page_width, page_height, columns=1, rows=1, cell_width=None, cell_height=None,
+                 margin_left=0, margin_top=0, gap_x=0, gap_y=0):
+        self.page_width = page_width
+        self.page_height = page_height
+        self.columns = columns
+        self.rows = rows
+        self.cell_width = cell_width or page_width
+        self.cell_height = cell_height or page_height
+        self.margin_left = margin_left
+        self.margin_top = margin_top
+        self.gap_x = gap_x
+        self.gap_y = gap_y
+
+    @property
+    def labels_per_page(self):
+        return self.columns * self.rows
+
+    def get_slots(self, label_width, label_height):
+        """
+        Return (x, y, scale) for every cell on a page, in row order. Labels are scaled
+        down uniformly to fit the cell when needed and centred in it.
+        """
+        scale = min(1, self.cell_width / label_width, self.cell_height / label_height)
+        inset_x = (self.cell_width - label_width * scale) / 2
+        inset_y = (self.cell_height - label_height * scale) / 2
+        return [
+            (
+                self.margin_left + col * (self.cell_width + self.gap_x) + inset_x,
+                self.margin_top + row * (self.cell_height + self.gap_y) + inset_y,
+                scale
+            )
+            for row in range(self.rows)
+            for col in range(self.columns)
+        ]
+
+
+# Sheet stock for N-up printing; "Single Label" prints one label per page of its own size
+LABEL_SHEETS = {
+    "A4 3x8": LabelSheet(210, 297, 3, 8, 70, 37, margin_top=0.5),
+    "A4 2x7": LabelSheet(210, 297, 2, 7, 99.1, 38.1, margin_left=4.65, margin_top=15.15, gap_x=2.5),
+    "Letter 3x10": LabelSheet(215.9, 279.4, 3, 10, 66.675, 25.4, margin_left=4.7625, margin_top=12.7, gap_x=3.175),
+    "Letter 2x5": LabelSheet(215.9, 279.4, 2, 5, 101.6, 50.8, margin_left=3.96875, margin_top=12.7, gap_x=4.7625),
+}
+
+def get_label_sheet(name, template):
+    """Return the sheet to impose a template's labels on, one label per page by default"""
+    if name in LABEL_SHEETS:
+        return LABEL_SHEETS[name]
+    layout = LABEL_TEMPLATES[template]
+    return LabelSheet(layout["width"], layout["height"])
+
+def iter_label_slots(sheet, template):
+    """Yield (new_page, transform) for consecutive labels, filling each sheet in row order"""
+    layout = LABEL_TEMPLATES[template]
+    slots = sheet.get_slots(layout["width"], layout["height"])
+    identity = slots == [(0, 0, 1)]
+    while True:
+        for index, (x, y, scale) in enumerate(slots):
+            yield index == 0, None if identity else (x, y, scale)
+
+
+@cache
+def compile_label_template(template, has_logo):
+    """
+    Resolve a template into a draw plan: a tuple of (op, args) with every coordinate fixed.
+    Plans are cached per (template, has_logo), so a run compiles its layout once.
+    """
+    layout = LABEL_TEMPLATES[template]
+    plan = []
+    for element in layout["elements"]:
+        if element["type"] == "logo":
+            if has_logo:
+                plan.append(("logo", (element["x"], element["y"], element["w"])))
+            continue
+
+        y = element.get("y", 0) + (element.get("logo_offset", 0) if has_logo else 0)
+        if element["type"] == "border":
+            plan.append(("rect", (0, 0, layout["width"], layout["height"])))
+        elif element["type"] == "text":
+            plan.append(("text", (
+                element["x"], y, element.get("w", 0), element["h"], element["font"], element["text"],
+                element.get("wrap", False)
+            )))
+        elif element["type"] == "barcode":
+            plan.append(("barcode", (element["x"], y, element["w"], element["h"])))
+        else:
+            raise ValueError(f"Unknown label element: {element['type']}")
+
+    return tuple(plan)
+
+def draw_label(pdf, plan, fields, logo=None, draw_barcode=None, transform=None):
+    """
+    Draw one label from a compiled plan on the current page of a StreamingLabelPDF.
+    `draw_barcode(pdf, x, y, w, h)` places the barcode. With `transform` (x, y, scale)
+    the label is drawn into that cell of a sheet instead of at the page origin.
+    """
+    if transform:
+        x, y, scale = transform
+        pdf._out(
+            f"q {scale:.5f} 0 0 {scale:.5f} {x * pdf.k:.2f} "
+            f"{(pdf.h - y - scale * pdf.h) * pdf.k:.2f} cm"
+        )
+
+    for op, args in plan:
+        if op == "logo":
+            if logo:
+                pdf.image(logo, args[0], args[1], w=args[2])
+        elif op == "rect":
+            pdf.rect(*args)
+        elif op == "text":
+            x, y, w, h, font, text, wrap = args
+            pdf.set_xy(x, y)
+            pdf.set_font(font[0], style=font[1], size=font[2])
+            if wrap:
+                pdf.multi_cell(w=w, h=h, txt=text.format(**fields), align="L")
+            else:
+                pdf.cell(w, h, text.format(**fields))
+        elif op == "barcode" and draw_barcode:
+            draw_barcode(pdf, *args)
+
+    if transform:
+        pdf._out("Q")
@@ -0,0 +1,70 @@
+def matrix_to_rects(matrix):
+    """
+    Reduce a QR module matrix to the dark rectangles needed to draw it, in module units.
+    Dark runs within a row become one rectangle, and identical runs on consecutive
+    rows are merged into a single taller rectangle.
+    Returns a list of (col, row, width, height) tuples.
+    """
+    rects = []
+    open_runs = {}  # (col, width) -> index into rects of the rectangle still growing downwards
+
+    for row, modules in enumerate(matrix):
+        runs = []
+        col = 0
+        size = len(modules)
+        while col < size:
+            if modules[col]:
+                start = col
+                while col < size and modules[col]:
+                    col += 1
+                runs.append((start, col - start))
+            else:
+                col += 1
+
+        next_open = {}
+        for run in runs:
+            idx = open_runs.get(run)
+            if idx is not None:
+                col, top, width, height = rects[idx]
+                rects[idx] = (col, top, width, height + 1)
+            else:
+                idx = len(rects)
+                rects.append((run[0], row, run[1], 1))
+            next_open[run] = idx
+        open_runs = next_open
+
+    return rects
+
+def draw_qr_rects(pdf, matrix, x, y, size, height=None):
+    """
+    Draw a module matrix as filled FPDF rectangles in a size x size box at (x, y).
+    Pass `height` for non-square symbols such as 1D barcodes.
+    """
+    module_w = size / len(matrix[0])
+    module_h = (height or size) / len(matrix)
+    pdf.set_fill_color(0, 0, 0)
+    for col, row, width, rows in matrix_to_rects(matrix):
+        pdf.rect(x + col * module_w, y + row * module_h, width * module_w, rows * module_h, style="F")
+
+def draw_qr_path(pdf, matrix, x, y, size, height=None):
+    """
+    Draw a module matrix as one merged, filled path in a size x size box at (x, y).
+    All rectangles go into a single content-stream path with one fill operator,
+    which keeps large label runs much smaller than per-rectangle drawing.
+    """
+    k = pdf.k
+    module_w = size / len(matrix[0])
+    module_h = (height or size) / len(matrix)
+    ops = ["q 0 g"]
+    for col, row, width, rows in matrix_to_rects(matrix):
+        ops.append(
+            f"{(x + col * module_w) * k:.2f} {(pdf.h - (y + row * module_h)) * k:.2f} "
+            f"{width * module_w * k:.2f} {-rows * module_h * k:.2f} re"
+        )
+    ops.append("f Q")
+    pdf._out("\n".join(ops))
+
+QR_DRAWERS = {
+    "Vector Rectangles": draw_qr_rects,
+    "Vector Path": draw_qr_path,
+}
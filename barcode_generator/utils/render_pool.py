@@ -0,0 +1,45 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from barcode_generator.utils.symbologies import get_symbology
+
+# Default pool size cap: a forked copy of the worker per core is too much memory on large hosts
+DEFAULT_MAX_PROCESSES = 4
+
+
+def render_png(job):
+    """
+    Render one (payload, symbology, compress_level, compact) job to PNG bytes.
+    Runs inside pool workers, so it must not touch frappe or the database.
+    Failures come back as None so one bad payload does not break the batch order.
+    """
+    payload, symbology, compress_level, compact = job
+    try:
+        return get_symbology(symbology).render_png(payload, compress_level=compress_level, compact=compact)
+    except Exception:
+        return None
+
+def available_cpus():
+    """CPUs this process may run on, honouring affinity masks set by containers or taskset"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+def render_pngs(jobs, processes=None, threshold=200, use_pool=False):
+    """
+    Render a list of (payload, symbology, compress_level, compact) jobs to PNG bytes, in order.
+    With `use_pool`, batches of at least `threshold` jobs are spread over a process pool of
+    `processes` workers (up to DEFAULT_MAX_PROCESSES CPUs when not set); smaller batches render
+    in this process, since they would not win back the cost of starting the pool. Callers only
+    pass `use_pool` from background jobs: forking a web worker mid-request is not safe.
+    """
+    processes = processes or min(DEFAULT_MAX_PROCESSES, available_cpus())
+    if not use_pool or processes <= 1 or len(jobs) < max(threshold, 2):
+        return [render_png(job) for job in jobs]
+
+    processes = min(processes, len(jobs))
+    # fork keeps worker start-up cheap: the app and the symbology backends are already imported
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+        return list(pool.map(render_png, jobs, chunksize=max(1, len(jobs) // (processes * 4))))
@@ -0,0 +1,179 @@
+from barcode_generator.utils.qr_raster import QRRasterizer, matrix_to_image, matrix_to_png
+
+# Registry of symbology name -> Symbology class. Backends (qrcode, python-barcode,
+# ppf-datamatrix) are imported inside get_matrix, so a symbology that is never used
+# never loads its library.
+SYMBOLOGIES = {}
+_instances = {}
+
+DEFAULT_SYMBOLOGY = "QR"
+
+
+def register_symbology(cls):
+    """Class decorator adding a Symbology to the registry under its name"""
+    SYMBOLOGIES[cls.name] = cls
+    _instances.pop(cls.name, None)
+    return cls
+
+def get_symbology(name=None):
+    """Return the shared instance of a registered symbology"""
+    name = name or DEFAULT_SYMBOLOGY
+    if name not in _instances:
+        if name not in SYMBOLOGIES:
+            raise ValueError(f"Unknown barcode symbology: {name}")
+        _instances[name] = SYMBOLOGIES[name]()
+    return _instances[name]
+
+
+class Symbology:
+    """
+    A barcode symbology reduced to a module matrix (rows of booleans, True = dark).
+    The same matrix feeds the 1-bit raster writer used for stored images and the
+    vector drawers used for PDFs, so a new symbology only has to implement get_matrix.
+    """
+
+    name = None
+    two_dimensional = True
+    # Raster pixels per module (x, y) when writing images
+    raster_scale = (10, 10)
+    # Compact storage keeps one pixel per module; scaling happens when the image is placed
+    compact_scale = (1, 1)
+
+    def get_matrix(self, payload):
+        raise NotImplementedError
+
+    def validate_payload(self, payload):
+        """Raise ValueError if the symbology cannot encode the payload"""
+        if not payload:
+            raise ValueError(f"{self.name} needs a non-empty payload")
+
+    def render(self, payload):
+        """Render a payload as a 1-bit PIL image"""
+        return matrix_to_image(self.get_matrix(payload), *self.raster_scale)
+
+    def render_png(self, payload, compress_level=6, compact=False):
+        """Render a payload as 1-bit PNG bytes, at one pixel per module when `compact`"""
+        return matrix_to_png(self.get_matrix(payload), *self.get_raster_scale(compact), compress_level=compress_level)
+
+    def get_raster_scale(self, compact=False):
+        return self.compact_scale if compact else self.raster_scale
+
+    def get_cache_variant(self):
+        """Extra options that change rendered output, as parts of the image cache key"""
+        return ()
+
+    def render_batch(self, payloads):
+        return [self.render(payload) for payload in payloads]
+
+    def fit_box(self, x, y, width, height):
+        """Return the (x, y, width, height) the symbol occupies when placed in a box"""
+        size = min(width, height)
+        return x, y, size, size
+
+
+@register_symbology
+class QRSymbology(Symbology):
+    name = "QR"
+
+    def __init__(self):
+        self.rasterizer = QRRasterizer(box_size=10, border=4)
+
+    def get_matrix(self, payload):
+        return self.rasterizer.get_matrix(payload)
+
+    def get_cache_variant(self):
+        if self.rasterizer.mask_pattern is None:
+            return ()
+        return (f"mask{self.rasterizer.mask_pattern}",)
+
+
+def set_qr_mask_pattern(mask_pattern=None):
+    """
+    Fix the QR mask pattern (0-7), or pass None to let qrcode pick the best of all eight.
+    The mask search renders each code eight times and is most of the cost of a QR code.
+    Set before render_pool forks, so its workers inherit it.
+    """
+    get_symbology("QR").rasterizer.mask_pattern = mask_pattern
+
+
+class LinearSymbology(Symbology):
+    """1D symbologies encoded with python-barcode and drawn as a single row of bars"""
+
+    two_dimensional = False
+    barcode_type = None
+    quiet_zone = 10
+    raster_scale = (2, 100)
+    # Bar height as a fraction of the symbol width when placed in a box
+    bar_height_ratio = 0.5
+
+    def get_matrix(self, payload):
+        import barcode
+
+        code = barcode.get_barcode_class(self.barcode_type)(payload).build()[0]
+        quiet = [False] * self.quiet_zone
+        return [quiet + [module == "1" for module in code] + quiet]
+
+    def fit_box(self, x, y, width, height):
+        bar_height = min(height, width * self.bar_height_ratio)
+        return x, y + (height - bar_height) / 2, width, bar_height
+
+
+@register_symbology
+class Code128Symbology(LinearSymbology):
+    name = "Code128"
+    barcode_type = "code128"
+
+    def validate_payload(self, payload):
+        super().validate_payload(payload)
+        if any(ord(char) > 127 for char in payload):
+            raise ValueError(f"Code128 can only encode ASCII characters, not {payload!r}")
+
+
+@register_symbology
+class EAN13Symbology(LinearSymbology):
+    name = "EAN-13"
+    barcode_type = "ean13"
+    quiet_zone = 11
+
+    def validate_payload(self, payload):
+        """EAN-13 takes 12 digits, or 13 whose last digit is the correct check digit"""
+        super().validate_payload(payload)
+        if not (payload.isascii() and payload.isdigit() and len(payload) in (12, 13)):
+            raise ValueError(f"EAN-13 can only encode 12 or 13 digits, not {payload!r}")
+        if len(payload) == 13 and int(payload[12]) != get_ean_check_digit(payload[:12]):
+            raise ValueError(f"{payload!r} does not end in its EAN-13 check digit")
+
+    def get_matrix(self, payload):
+        self.validate_payload(payload)
+        return super().get_matrix(payload)
+
+
+def get_ean_check_digit(digits):
+    total = sum(int(digit) * (3 if index % 2 else 1) for index, digit in enumerate(digits))
+    return (10 - total % 10) % 10
+
+
+
+@register_symbology
+class DataMatrixSymbology(Symbology):
+    name = "DataMatrix"
+    quiet_zone = 2
+
+    def validate_payload(self, payload):
+        super().validate_payload(payload)
+        self.get_backend()
+
+    def get_backend(self):
+        """Return the ppf-datamatrix encoder, as a ValueError when it is not installed"""
+        try:
+            from ppf.datamatrix import DataMatrix
+        except ImportError:
+            raise ValueError("DataMatrix needs the ppf-datamatrix package, which is not installed")
+        return DataMatrix
+
+    def get_matrix(self, payload):
+        modules = self.get_backend()(payload).matrix
+        width = len(modules[0]) + 2 * self.quiet_zone
+        blank = [[False] * width for _ in range(self.quiet_zone)]
+        quiet = [False] * self.quiet_zone
+        return blank + [quiet + [bool(module) for module in row] + quiet for row in modules] + blank
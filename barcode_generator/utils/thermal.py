@@ -0,0 +1,182 @@
+import socket
+
+from barcode_generator.utils.symbologies import get_symbology
+
+# Printer dots per mm for the supported print head resolutions
+DOTS_PER_MM = {203: 8, 300: 12}
+
+THERMAL_LANGUAGES = ("ZPL", "EPL")
+
+# EPL2 barcode types for the linear symbologies
+EPL_BARCODE_TYPES = {"Code128": "1", "EAN-13": "E30"}
+
+# EPL2 resident fonts 1-5 as (character width, height) in dots, per print head resolution
+EPL_FONTS = {
+    8: {"1": (8, 12), "2": (10, 16), "3": (12, 20), "4": (14, 24), "5": (32, 48)},
+    12: {"1": (12, 20), "2": (16, 28), "3": (20, 36), "4": (24, 44), "5": (48, 80)},
+}
+
+
+class ThermalLabelRenderer:
+    """
+    Turn compiled label plans (see label_templates) into ZPL or EPL for thermal printers.
+    Barcodes use the printer's own QR/Code128/EAN-13/DataMatrix commands, so nothing is
+    rasterised on the server; the only graphic is the logo, downloaded to the printer once
+    per job (ZPL) and recalled on every label.
+    """
+
+    def __init__(self, language="ZPL", dpi=203, label_width=100, label_height=50):
+        if language not in THERMAL_LANGUAGES:
+            raise ValueError(f"Unknown thermal printer language: {language}")
+        self.language = language
+        self.dpmm = DOTS_PER_MM.get(int(dpi), 8)
+        self.label_width = label_width
+        self.label_height = label_height
+
+    def dots(self, mm):
+        return round(mm * self.dpmm)
+
+    def job_header(self, plan, logo=None):
+        """Commands sent once before the first label: the logo graphic download, if the plan has one"""
+        if self.language != "ZPL" or logo is None:
+            return ""
+        for op, args in plan:
+            if op == "logo":
+                return zpl_download_graphic(logo, self.dots(args[2]), "R:LOGO.GRF")
+        return ""
+
+    def render(self, plan, fields, symbology=None):
+        """Return the commands for one label"""
+        if self.language == "ZPL":
+            return self.render_zpl(plan, fields, symbology)
+        return self.render_epl(plan, fields, symbology)
+
+    def render_zpl(self, plan, fields, symbology=None):
+        commands = ["^XA", f"^PW{self.dots(self.label_width)}", f"^LL{self.dots(self.label_height)}", "^CI28"]
+
+        for op, args in plan:
+            if op == "logo":
+                commands.append(f"^FO{self.dots(args[0])},{self.dots(args[1])}^XGR:LOGO.GRF,1,1^FS")
+            elif op == "rect":
+                x, y, w, h = args
+                commands.append(f"^FO{self.dots(x)},{self.dots(y)}^GB{self.dots(w)},{self.dots(h)},2^FS")
+            elif op == "text":
+                x, y, w, h, font, text, wrap = args
+                font_height = self.dots(font[2] * 25.4 / 72)
+                block = f"^FB{self.dots(w)},{max(1, int((self.label_height - y) // h))},0,L" if wrap else ""
+                commands.append(
+                    f"^FO{self.dots(x + 1)},{self.dots(y)}^A0N,{font_height},{font_height}{block}"
+                    f"^FH_^FD{zpl_escape(text.format(**fields))}^FS"
+                )
+            elif op == "barcode":
+                commands.append(self.zpl_barcode(fields["serial_no"], symbology, *args))
+
+        commands.append("^XZ")
+        return "\n".join(commands) + "\n"
+
+    def zpl_barcode(self, data, symbology, x, y, width, height):
+        symbol = get_symbology(symbology)
+        symbol.validate_payload(data)
+        modules = self.count_modules(symbol, data)
+        box_x, box_y, box_w, box_h = symbol.fit_box(x, y, width, height)
+        origin = f"^FO{self.dots(box_x)},{self.dots(box_y)}"
+        scale = max(1, self.dots(box_w) // modules)
+
+        if symbol.name == "QR":
+            return f"{origin}^BQN,2,{min(scale, 10)}^FH_^FDLA,{zpl_escape(data)}^FS"
+        if symbol.name == "DataMatrix":
+            return f"{origin}^BXN,{scale},200^FH_^FD{zpl_escape(data)}^FS"
+        if symbol.name == "EAN-13":
+            # ^BE takes the 12 data digits and adds the check digit, which validate_payload has verified
+            return f"{origin}^BY{scale}^BEN,{self.dots(box_h)},N,N^FD{data[:12]}^FS"
+        return f"{origin}^BY{scale}^BCN,{self.dots(box_h)},N,N,N^FH_^FD{zpl_escape(data)}^FS"
+
+    def render_epl(self, plan, fields, symbology=None):
+        commands = ["", "N", f"q{self.dots(self.label_width)}", f"Q{self.dots(self.label_height)},24"]
+
+        for op, args in plan:
+            if op == "rect":
+                x, y, w, h = args
+                commands.append(f"X{self.dots(x)},{self.dots(y)},2,{self.dots(x + w)},{self.dots(y + h)}")
+            elif op == "text":
+                x, y, w, h, font, text, wrap = args
+                text = text.format(**fields)
+                epl_font, char_width = self.epl_font(font[2])
+                # EPL has no text blocks: wrap on the font's character advance (2-dot gap included)
+                per_line = max(1, self.dots(w) // (char_width + 2)) if wrap else len(text) or 1
+                lines = [text[i:i + per_line] for i in range(0, len(text), per_line)] or [""]
+                for line_no, line in enumerate(lines):
+                    commands.append(
+                        f'A{self.dots(x + 1)},{self.dots(y + line_no * h)},0,{epl_font},1,1,N,"{epl_escape(line)}"'
+                    )
+            elif op == "barcode":
+                commands.append(self.epl_barcode(fields["serial_no"], symbology, *args))
+            # Logos need a PCX upload in EPL and are left off
+
+        commands.append("P1")
+        return "\n".join(commands) + "\n"
+
+    def epl_font(self, size):
+        """The largest resident EPL font no taller than a `size` pt template font, and its character width"""
+        target = self.dots(size * 25.4 / 72)
+        fonts = EPL_FONTS.get(self.dpmm, EPL_FONTS[8])
+        fitting = [name for name, (width, height) in fonts.items() if height <= target] or ["1"]
+        return fitting[-1], fonts[fitting[-1]][0]
+
+    def epl_barcode(self, data, symbology, x, y, width, height):
+        symbol = get_symbology(symbology)
+        symbol.validate_payload(data)
+        modules = self.count_modules(symbol, data)
+        box_x, box_y, box_w, box_h = symbol.fit_box(x, y, width, height)
+        scale = max(1, self.dots(box_w) // modules)
+        x, y = self.dots(box_x), self.dots(box_y)
+
+        if symbol.name == "QR":
+            return f'b{x},{y},Q,s{min(scale, 99)},"{epl_escape(data)}"'
+        if symbol.name == "DataMatrix":
+            return f'b{x},{y},D,"{epl_escape(data)}"'
+        if symbol.name == "EAN-13":
+            # E30 also takes the 12 data digits and adds the verified check digit itself
+            data = data[:12]
+        return f'B{x},{y},0,{EPL_BARCODE_TYPES[symbol.name]},{scale},{scale * 2},{self.dots(box_h)},N,"{epl_escape(data)}"'
+
+    @staticmethod
+    def count_modules(symbol, data):
+        """Modules across the symbol without its quiet zone, to size it to the printer's dots"""
+        matrix = symbol.get_matrix(data)
+        quiet = getattr(symbol, "quiet_zone", 0)
+        if symbol.name == "QR":
+            quiet = symbol.rasterizer.border
+        return max(1, len(matrix[0]) - 2 * quiet)
+
+
+def zpl_escape(text):
+    """Hex-escape the characters ZPL treats as commands, for fields prefixed with ^FH_"""
+    return str(text).replace("_", "_5F").replace("^", "_5E").replace("~", "_7E")
+
+def epl_escape(text):
+    return str(text).replace("\\", "\\\\").replace('"', '\\"')
+
+def zpl_download_graphic(image, width, name):
+    """~DG command storing a PIL image on the printer as a 1-bit graphic `width` dots wide"""
+    height = max(1, round(image.height * width / image.width))
+    image = image.convert("RGBA")
+    background = image.copy()
+    background.paste((255, 255, 255, 255), (0, 0, *image.size))
+    background.alpha_composite(image)
+    bitmap = background.convert("L").resize((width, height)).point(lambda value: 255 if value < 128 else 0).convert("1")
+
+    # PIL packs white as 1; after the threshold above, 1 now marks the dots to burn
+    bytes_per_row = (width + 7) // 8
+    data = bitmap.tobytes()
+    return f"~DG{name},{len(data)},{bytes_per_row},{data.hex().upper()}\n"
+
+def send_to_printer(chunks, host, port=9100, timeout=30):
+    """Send a print job to a raw TCP (JetDirect/port 9100) printer, chunk by chunk"""
+    sent = 0
+    with socket.create_connection((host, int(port or 9100)), timeout=timeout) as connection:
+        for chunk in chunks:
+            data = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+            connection.sendall(data)
+            sent += len(data)
+    return sent